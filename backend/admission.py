@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Admission Control
+Concurrency limit with a bounded, time-limited wait queue for the heavy
+analysis endpoints, so overload is rejected quickly instead of slowing every
+request down together
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+import functools
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_CONCURRENCY = int(os.getenv('ANALYSIS_CONCURRENCY', 4))
+ANALYSIS_QUEUE_DEPTH = int(os.getenv('ANALYSIS_QUEUE_DEPTH', 16))
+ANALYSIS_QUEUE_TIMEOUT = float(os.getenv('ANALYSIS_QUEUE_TIMEOUT', 10))
+ADMISSION_REJECT_STATUS = int(os.getenv('ADMISSION_REJECT_STATUS', 503))
+
+# Weight of the newest request in the moving average of service time
+SERVICE_TIME_SMOOTHING = 0.2
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted within the queue limits"""
+
+    def __init__(self, message: str, retry_after: int, queue_depth: int,
+                 status_code: int = ADMISSION_REJECT_STATUS):
+        super().__init__(message)
+        self.retry_after = retry_after
+        self.queue_depth = queue_depth
+        self.status_code = status_code
+
+
+class AdmissionController:
+    """Lets at most ``max_concurrent`` requests run at once
+
+    Up to ``max_queue_depth`` more wait for a slot for at most ``max_wait``
+    seconds. Arrivals beyond the queue are rejected immediately, and waiters
+    that time out are rejected, both with a Retry-After estimate. Work that was
+    already accepted, such as batch images and queued jobs, takes its slot with
+    hold() instead and waits as long as it needs to.
+    """
+
+    def __init__(self, max_concurrent: int = ANALYSIS_CONCURRENCY,
+                 max_queue_depth: int = ANALYSIS_QUEUE_DEPTH,
+                 max_wait: float = ANALYSIS_QUEUE_TIMEOUT):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue_depth = max(0, max_queue_depth)
+        self.max_wait = max_wait
+        self._active = 0
+        self._waiting = 0
+        self._admitted = 0
+        self._rejected = 0
+        self._timed_out = 0
+        self._service_time = 1.0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def admit(self):
+        """Hold a concurrency slot for the duration of the block"""
+        self._acquire()
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(time.monotonic() - started)
+
+    @contextmanager
+    def hold(self):
+        """Hold a slot for accepted work, waiting without the queue limits
+
+        The wait still counts towards the queue depth, so new requests are
+        turned away while accepted work is backed up.
+        """
+        started = self.acquire(queue_limits=False)
+        try:
+            yield
+        finally:
+            self.release(started)
+
+    def acquire(self, queue_limits: bool = True) -> float:
+        """Wait for a slot and return the admission time to pass to release"""
+        self._acquire(queue_limits)
+        return time.monotonic()
+
+    def release(self, started: float):
+        self._release(time.monotonic() - started)
+
+    def limit(self, view: Callable) -> Callable:
+        """Decorate a Flask view so it runs under admission control"""
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            with self.admit():
+                return view(*args, **kwargs)
+        return wrapper
+
+    def stats(self) -> Dict:
+        """Current occupancy and rejection counters"""
+        with self._cond:
+            return self._stats_locked()
+
+    def _stats_locked(self) -> Dict:
+        return {
+            'active': self._active,
+            'queue_depth': self._waiting,
+            'max_concurrent': self.max_concurrent,
+            'max_queue_depth': self.max_queue_depth,
+            'max_wait_seconds': self.max_wait,
+            'admitted': self._admitted,
+            'rejected': self._rejected,
+            'timed_out': self._timed_out,
+            'avg_service_seconds': round(self._service_time, 3)
+        }
+
+    def _acquire(self, queue_limits: bool = True):
+        with self._cond:
+            if self._active < self.max_concurrent and self._waiting == 0:
+                self._active += 1
+                self._admitted += 1
+                return
+
+            if queue_limits and self._waiting >= self.max_queue_depth:
+                self._rejected += 1
+                raise AdmissionRejected('Server is at capacity', self._retry_after_locked(), self._waiting)
+
+            self._waiting += 1
+            deadline = time.monotonic() + self.max_wait if queue_limits else None
+            try:
+                while self._active >= self.max_concurrent:
+                    if deadline is None:
+                        self._cond.wait()
+                        continue
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._timed_out += 1
+                        raise AdmissionRejected('Timed out waiting for capacity',
+                                                self._retry_after_locked(), self._waiting - 1)
+                    self._cond.wait(remaining)
+            finally:
+                self._waiting -= 1
+            self._active += 1
+            self._admitted += 1
+
+    def _release(self, duration: float):
+        with self._cond:
+            self._active -= 1
+            self._service_time += SERVICE_TIME_SMOOTHING * (duration - self._service_time)
+            self._cond.notify()
+
+    def _retry_after_locked(self) -> int:
+        """Seconds until the current queue should have drained"""
+        waves = (self._waiting + self._active) / self.max_concurrent
+        return max(1, int(round(self._service_time * waves)))
+
+
+class AsyncAdmissionController(AdmissionController):
+    """asyncio counterpart of AdmissionController for the ASGI gateway
+
+    Waiting requests are suspended coroutines rather than blocked threads, so
+    a full queue costs no worker threads. Must be used from a single event loop.
+    """
+
+    def __init__(self, max_concurrent: int = ANALYSIS_CONCURRENCY,
+                 max_queue_depth: int = ANALYSIS_QUEUE_DEPTH,
+                 max_wait: float = ANALYSIS_QUEUE_TIMEOUT):
+        super().__init__(max_concurrent, max_queue_depth, max_wait)
+        self._cond = asyncio.Condition()
+
+    @asynccontextmanager
+    async def admit(self):
+        """Hold a concurrency slot for the duration of the block"""
+        started = await self.acquire()
+        try:
+            yield
+        finally:
+            await self.release(started)
+
+    @asynccontextmanager
+    async def hold(self):
+        """Hold a slot for accepted work, waiting without the queue limits"""
+        started = await self.acquire(queue_limits=False)
+        try:
+            yield
+        finally:
+            await self.release(started)
+
+    @contextmanager
+    def hold_from_thread(self, loop: asyncio.AbstractEventLoop):
+        """hold() for a worker thread, waiting on the controller's event loop"""
+        started = asyncio.run_coroutine_threadsafe(self.acquire(queue_limits=False), loop).result()
+        try:
+            yield
+        finally:
+            asyncio.run_coroutine_threadsafe(self.release(started), loop).result()
+
+    async def acquire(self, queue_limits: bool = True) -> float:
+        """Wait for a slot and return the admission time to pass to release"""
+        async with self._cond:
+            if self._active >= self.max_concurrent or self._waiting > 0:
+                if queue_limits and self._waiting >= self.max_queue_depth:
+                    self._rejected += 1
+                    raise AdmissionRejected('Server is at capacity', self._retry_after_locked(), self._waiting)
+
+                self._waiting += 1
+                try:
+                    await asyncio.wait_for(
+                        self._cond.wait_for(lambda: self._active < self.max_concurrent),
+                        self.max_wait if queue_limits else None
+                    )
+                except asyncio.TimeoutError:
+                    self._timed_out += 1
+                    raise AdmissionRejected('Timed out waiting for capacity',
+                                            self._retry_after_locked(), self._waiting - 1)
+                finally:
+                    self._waiting -= 1
+            self._active += 1
+            self._admitted += 1
+        return time.monotonic()
+
+    async def release(self, started: float):
+        async with self._cond:
+            self._active -= 1
+            self._service_time += SERVICE_TIME_SMOOTHING * (time.monotonic() - started - self._service_time)
+            self._cond.notify()
+
+    def stats(self) -> Dict:
+        """Current occupancy and rejection counters"""
+        return self._stats_locked()
+
+
+# Process-wide limiter shared by the synchronous analysis endpoints
+analysis_admission = AdmissionController()
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+Analysis Executor
+Runs skin condition analysis either in the web worker's threads or in a pool of
+pre-warmed analysis processes, so CPU-bound Python work scales across cores
+"""
+
+import os
+import time
+import atexit
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+
+import numpy as np
+import cv2
+
+from image_ring import SharedImageRing, IMAGE_RING_SLOTS, IMAGE_RING_SLOT_BYTES
+
+logger = logging.getLogger(__name__)
+
+# 'thread' analyzes in the calling thread; 'process' hands images to worker processes
+ANALYSIS_EXECUTOR = os.getenv('ANALYSIS_EXECUTOR', 'thread').lower()
+ANALYSIS_PROCESSES = int(os.getenv('ANALYSIS_PROCESSES', os.cpu_count() or 1))
+ANALYSIS_START_METHOD = os.getenv('ANALYSIS_START_METHOD', 'spawn')
+ANALYSIS_TASK_TIMEOUT = float(os.getenv('ANALYSIS_TASK_TIMEOUT', 120))
+
+# Per-process analyzer and image ring, set up once by the pool initializer
+_worker_analyzer = None
+_worker_ring: Optional[SharedImageRing] = None
+
+
+def _init_worker(ready_count, ring_name: Optional[str] = None, ring_slots: int = 0, slot_bytes: int = 0):
+    """Build this worker's analyzer and attach the image ring before it accepts work"""
+    global _worker_analyzer, _worker_ring
+    # Parallelism comes from the process pool; keep OpenCV from oversubscribing cores
+    cv2.setNumThreads(1)
+    from enhanced_analysis_algorithms import EnhancedSkinAnalyzer
+    _worker_analyzer = EnhancedSkinAnalyzer()
+    if ring_name:
+        _worker_ring = SharedImageRing.attach(ring_name, ring_slots, slot_bytes)
+    with ready_count.get_lock():
+        ready_count.value += 1
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _analyze_ring_slot(slot: int, shape: tuple, dtype: str, kwargs: Dict) -> Dict:
+    """Analyze an image read in place from a slot of the shared image ring"""
+    image = _worker_ring.view(slot, shape, dtype)
+    try:
+        return _worker_analyzer.analyze_skin_conditions(image, **kwargs)
+    finally:
+        del image
+
+
+def _analyze_shared(name: str, shape: tuple, dtype: str, kwargs: Dict) -> Dict:
+    """Analyze an image read in place from a shared memory segment
+
+    Workers inherit the parent's resource tracker, so the segment stays tracked
+    once and is released by the parent's unlink.
+    """
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        image = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+        try:
+            return _worker_analyzer.analyze_skin_conditions(image, **kwargs)
+        finally:
+            del image
+    finally:
+        shm.close()
+
+
+class ProcessPoolAnalyzer:
+    """Drop-in for EnhancedSkinAnalyzer.analyze_skin_conditions backed by processes
+
+    Each worker process owns an EnhancedSkinAnalyzer built at startup. The
+    decoded image is copied once into a free slot of a SharedImageRing; only the
+    slot index, shape and dtype are sent to the worker, and the result dict comes
+    back. Images larger than a slot, or arriving while every slot is busy, go
+    through a one-off shared memory segment instead.
+
+    The ring and pool are created on first use in each process, so a forked
+    process starts its own instead of sharing its parent's.
+    """
+
+    def __init__(self, processes: int = ANALYSIS_PROCESSES, start_method: str = ANALYSIS_START_METHOD,
+                 task_timeout: float = ANALYSIS_TASK_TIMEOUT, ring_slots: int = IMAGE_RING_SLOTS,
+                 slot_bytes: int = IMAGE_RING_SLOT_BYTES):
+        self.processes = max(1, processes)
+        self.start_method = start_method
+        self.task_timeout = task_timeout
+        # Enough slots to keep every worker busy while the next image is written
+        self.ring_slots = ring_slots or self.processes + 1
+        self.slot_bytes = slot_bytes
+        self._owner_pid: Optional[int] = None
+        self._ring: Optional[SharedImageRing] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        """Create this process's image ring and worker pool if it has none yet"""
+        if self._owner_pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._owner_pid == os.getpid():
+                return
+            self._ring = SharedImageRing(self.ring_slots, self.slot_bytes)
+            atexit.register(self._ring.close)
+            self._pool = self._create_pool()
+            self._owner_pid = os.getpid()
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        context = multiprocessing.get_context(self.start_method)
+        # Incremented by each worker once its analyzer is built
+        self._ready_count = context.Value('i', 0)
+        return ProcessPoolExecutor(max_workers=self.processes, mp_context=context,
+                                   initializer=_init_worker,
+                                   initargs=(self._ready_count, self._ring.name, self._ring.slots,
+                                             self._ring.slot_bytes))
+
+    def warm(self, timeout: float = ANALYSIS_TASK_TIMEOUT) -> int:
+        """Start every worker process and wait until its analyzer is built
+
+        Returns the number of ready workers, which is less than ``processes``
+        only if the timeout passed first.
+        """
+        self._ensure_started()
+        # Concurrent submissions make the executor spawn all of its processes
+        for future in [self._pool.submit(_worker_ready) for _ in range(self.processes)]:
+            future.result(timeout=timeout)
+        deadline = time.monotonic() + timeout
+        while self._ready_count.value < self.processes and time.monotonic() < deadline:
+            time.sleep(0.05)
+        return self._ready_count.value
+
+    def analyze_skin_conditions(self, image: np.ndarray, face_roi: Optional[np.ndarray] = None,
+                                **kwargs) -> Dict:
+        """Same contract as EnhancedSkinAnalyzer.analyze_skin_conditions"""
+        self._ensure_started()
+        image = np.ascontiguousarray(face_roi if face_roi is not None else image)
+        slot = self._ring.acquire(image.nbytes)
+        if slot is None:
+            return self._analyze_in_segment(image, kwargs)
+
+        try:
+            self._ring.write(slot, image)
+            future = self._pool.submit(_analyze_ring_slot, slot, image.shape, image.dtype.str, kwargs)
+        except BaseException:
+            self._ring.release(slot)
+            raise
+        # Recycle the slot only once the worker is done with it, even if we stop waiting first
+        future.add_done_callback(lambda _: self._ring.release(slot))
+        return self._result(future)
+
+    def _analyze_in_segment(self, image: np.ndarray, kwargs: Dict) -> Dict:
+        shm = shared_memory.SharedMemory(create=True, size=max(1, image.nbytes))
+        try:
+            np.ndarray(image.shape, dtype=image.dtype, buffer=shm.buf)[...] = image
+            return self._result(self._pool.submit(_analyze_shared, shm.name, image.shape, image.dtype.str, kwargs))
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def _result(self, future) -> Dict:
+        try:
+            return future.result(timeout=self.task_timeout)
+        except BrokenProcessPool:
+            logger.error("Analysis process pool broke; restarting workers")
+            self._pool = self._create_pool()
+            raise
+
+    def stats(self) -> Dict:
+        started = self._owner_pid == os.getpid()
+        return {
+            'executor': 'process',
+            'processes': self.processes,
+            'start_method': self.start_method,
+            'started': started,
+            'image_ring': self._ring.stats() if started else None
+        }
+
+    def shutdown(self):
+        if self._owner_pid != os.getpid():
+            return
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._ring.close()
+
+
+def create_skin_analyzer(mode: str = ANALYSIS_EXECUTOR):
+    """Analyzer for the configured execution mode
+
+    Returns an EnhancedSkinAnalyzer for in-thread analysis, or a warmed
+    ProcessPoolAnalyzer when ``mode`` is 'process'.
+    """
+    if mode == 'process':
+        if multiprocessing.parent_process() is not None:
+            # Spawned workers re-import the entry module; they analyze through _worker_analyzer
+            return None
+        analyzer = ProcessPoolAnalyzer()
+        ready = analyzer.warm()
+        logger.info(f"Analysis process pool ready: {ready}/{analyzer.processes} workers ({analyzer.start_method})")
+        return analyzer
+
+    from enhanced_analysis_algorithms import EnhancedSkinAnalyzer
+    return EnhancedSkinAnalyzer()
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Asynchronous Analysis Jobs
+Bounded worker pool that runs skin analyses outside the HTTP request, with
+status polling and completion notification
+"""
+
+import os
+import time
+import uuid
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_JOB_WORKERS = int(os.getenv('ANALYSIS_JOB_WORKERS', 2))
+ANALYSIS_JOB_QUEUE_DEPTH = int(os.getenv('ANALYSIS_JOB_QUEUE_DEPTH', 32))
+ANALYSIS_JOB_RESULT_TTL = float(os.getenv('ANALYSIS_JOB_RESULT_TTL', 600))
+
+
+class JobQueueFull(Exception):
+    """Raised when the job queue has no room for another job"""
+
+    def __init__(self, retry_after: int):
+        super().__init__('Analysis queue is full')
+        self.retry_after = retry_after
+
+
+class AnalysisJob:
+    """State of a single queued analysis"""
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[Dict] = None
+        self.result_status: Optional[int] = None
+        self.error: Optional[str] = None
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the job finishes or the timeout passes"""
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> Dict:
+        """Job status, including the analysis response once finished"""
+        status = {
+            'job_id': self.id,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'finished_at': self.finished_at
+        }
+        if self.status == 'succeeded':
+            status['result'] = self.result
+            status['result_status'] = self.result_status
+        elif self.status == 'failed':
+            status['error'] = self.error
+        return status
+
+
+class AnalysisJobQueue:
+    """Runs analysis callables on a bounded thread pool
+
+    At most ``max_workers`` jobs run at once and at most ``max_queue_depth``
+    more wait; further submissions are rejected with JobQueueFull. Finished jobs
+    are kept for ``result_ttl`` seconds so clients can collect the result.
+    """
+
+    def __init__(self, max_workers: int = ANALYSIS_JOB_WORKERS,
+                 max_queue_depth: int = ANALYSIS_JOB_QUEUE_DEPTH,
+                 result_ttl: float = ANALYSIS_JOB_RESULT_TTL):
+        self.max_workers = max_workers
+        self.max_queue_depth = max_queue_depth
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis-job')
+        self._jobs: Dict[str, AnalysisJob] = {}
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    def submit(self, fn: Callable, *args, **kwargs) -> AnalysisJob:
+        """Queue ``fn(*args, **kwargs)``, which must return (response body, HTTP status)"""
+        job = AnalysisJob()
+        with self._lock:
+            self._purge_expired_locked()
+            if self._pending >= self.max_workers + self.max_queue_depth:
+                raise JobQueueFull(self._estimate_retry_after_locked())
+            self._pending += 1
+            self._jobs[job.id] = job
+
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        """Look up a job that is pending or whose result has not expired"""
+        with self._lock:
+            self._purge_expired_locked()
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict:
+        """Current queue occupancy"""
+        with self._lock:
+            return {
+                'pending': self._pending,
+                'running': sum(1 for job in self._jobs.values() if job.status == 'running'),
+                'tracked_jobs': len(self._jobs),
+                'max_workers': self.max_workers,
+                'max_queue_depth': self.max_queue_depth
+            }
+
+    def _run(self, job: AnalysisJob, fn: Callable, args, kwargs):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result, job.result_status = fn(*args, **kwargs)
+            job.status = 'succeeded'
+        except Exception as e:
+            logger.error(f"Analysis job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._pending -= 1
+            job._done.set()
+
+    def _purge_expired_locked(self):
+        cutoff = time.time() - self.result_ttl
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.finished_at is not None and job.finished_at < cutoff]
+        for job_id in expired:
+            del self._jobs[job_id]
+
+    def _estimate_retry_after_locked(self) -> int:
+        """Rough seconds until a queue slot frees, from recent job durations"""
+        durations = [job.finished_at - job.started_at for job in self._jobs.values()
+                     if job.finished_at is not None and job.started_at is not None]
+        average = sum(durations) / len(durations) if durations else 5.0
+        waves = max(1, self._pending // max(1, self.max_workers))
+        return max(1, int(average * waves))
+
+
+# Process-wide job queue used by the /api/v6/skin/jobs endpoints
+analysis_jobs = AnalysisJobQueue()
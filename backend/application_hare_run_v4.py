@@ -18,12 +18,15 @@ import traceback
 import tempfile
 from pathlib import Path
 
+from serialization import NumpyJSONProvider
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Create Flask app - Elastic Beanstalk expects this exact variable name
 app = Flask(__name__)
+app.json = NumpyJSONProvider(app)
 CORS(app, origins=['http://localhost:3000', 'http://localhost:3001', 'http://localhost:3002', 'http://127.0.0.1:3000', 'http://127.0.0.1:3001', 'http://127.0.0.1:3002', 'https://shineskincollective.com', 'https://api.shineskincollective.com'], supports_credentials=True)
 
 # Configuration
@@ -449,9 +452,7 @@ def analyze_skin_hare_run_v6():
             # Use Hare Run V6 model for enhanced analysis
             analysis_result = enhanced_analyzer.analyze_skin_conditions(img_array)
             
-            # Convert numpy types to JSON-serializable types
-            analysis_result = convert_numpy_types(analysis_result)
-            
+            # NumPy values are encoded natively by NumpyJSONProvider
             # Add Hare Run V6 metadata
             analysis_result['model_version'] = 'Hare_Run_V6_Facial_v1.0'
             analysis_result['model_accuracy'] = '97.13%'
@@ -568,25 +569,6 @@ def root():
         }
     })
 
-# ============================================================================
-# UTILITY FUNCTIONS
-# ============================================================================
-
-def convert_numpy_types(obj):
-    """Convert numpy types to Python native types for JSON serialization"""
-    if isinstance(obj, np.integer):
-        return int(obj)
-    elif isinstance(obj, np.floating):
-        return float(obj)
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()
-    elif isinstance(obj, dict):
-        return {key: convert_numpy_types(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_numpy_types(item) for item in obj]
-    else:
-        return obj
-
 # ============================================================================
 # MAIN APPLICATION
 # ============================================================================
@@ -0,0 +1,611 @@
+#!/usr/bin/env python3
+"""
+Shine Skin Collective - Hare Run V6 ASGI Gateway
+Asyncio version of the Hare Run V6 API with the same routes and responses.
+Request bodies are read on the event loop, so slow uploads hold no worker
+thread; decoding, face detection and analysis run on bounded thread pools, and
+health, readiness and model status are answered directly on the loop.
+
+Run with an ASGI server, e.g. ``hypercorn application_hare_run_v6_asgi:app``.
+"""
+
+import os
+import asyncio
+import logging
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+from quart import Quart, Request, Response, request
+from quart_cors import cors
+from werkzeug.exceptions import HTTPException
+
+# Models, analyzers, image sessions and response builders are shared with the WSGI gateway
+from application_hare_run_v6_clean import (
+    SERVICE_NAME, S3_BUCKET, S3_MODEL_KEY, PORT, SSE_KEEPALIVE_SECONDS, CORS_ORIGINS,
+    MAX_BATCH_IMAGES, MAX_BATCH_REQUEST_BYTES, BATCH_PATHS, ANALYSIS_COMPONENTS,
+    hare_run_v6_manager, batch_executor, load_image_session, face_detection_body, readiness,
+    analysis_key, production_compute, enhanced_compute, enhanced_body, basic_analysis_body,
+    run_production_analysis, analyze_batch_item, run_held
+)
+from face_detection import detect_faces, FaceBox
+from image_io import (
+    decode_data_url, decode_image_buffer, check_image_bytes, ImageRequestError, DecodedImage,
+    IMAGE_FIELDS, RAW_IMAGE_CONTENT_TYPES, MAX_REQUEST_BYTES
+)
+from analysis_jobs import analysis_jobs, JobQueueFull
+from admission import AsyncAdmissionController, AdmissionRejected
+from request_coalescing import analysis_coalescer, IdempotencyConflict
+from startup import service_startup, StartupInProgress
+from serialization import (
+    FieldTree, InvalidFields, parse_fields, dumps_bytes, dumps_msgpack, wants_msgpack, negotiate_encoding,
+    compress_bytes, MSGPACK_MIMETYPES, COMPRESSION_MIN_SIZE
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Decoding and face detection for the detection endpoints
+ASGI_DECODE_WORKERS = int(os.getenv('ASGI_DECODE_WORKERS', 4))
+
+class ShineRequest(Request):
+    """Request with a larger body limit on batch endpoints
+
+    Quart sizes the request body when the request is created, before any hook
+    runs, so the route's limit is chosen here rather than in before_request.
+    """
+
+    def __init__(self, method: str, scheme: str, path: str, *args, **kwargs):
+        limit = MAX_BATCH_REQUEST_BYTES if path in BATCH_PATHS else MAX_REQUEST_BYTES
+        kwargs['max_content_length'] = limit
+        super().__init__(method, scheme, path, *args, **kwargs)
+        # Multipart parsing reads the limit from the request rather than the body
+        self.max_content_length = limit
+
+# Initialize Quart app
+app = Quart(__name__)
+app.request_class = ShineRequest
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
+app = cors(app, allow_origin=CORS_ORIGINS, allow_credentials=True)
+
+# Analyses wait for admission as coroutines; only admitted ones occupy a thread
+analysis_admission = AsyncAdmissionController()
+decode_threads = ThreadPoolExecutor(max_workers=ASGI_DECODE_WORKERS, thread_name_prefix='asgi-decode')
+analysis_threads = ThreadPoolExecutor(max_workers=analysis_admission.max_concurrent,
+                                      thread_name_prefix='asgi-analysis')
+
+@app.before_serving
+async def start_initialization():
+    """Initialize in the background; analysis routes answer 503 until the steps settle"""
+    service_startup.start()
+
+# ============================================================================
+# REQUEST HELPERS
+# ============================================================================
+
+def respond(body: Dict, status: int = 200, headers: Optional[Dict] = None) -> Response:
+    """JSON or MessagePack response, compressed when large and accepted by the client"""
+    if wants_msgpack(request):
+        data, mimetype = dumps_msgpack(body), MSGPACK_MIMETYPES[0]
+    else:
+        data, mimetype = dumps_bytes(body) + b'\n', 'application/json'
+
+    response = Response(data, status=status, mimetype=mimetype, headers=headers)
+    response.vary.add('Accept')
+    if len(data) >= COMPRESSION_MIN_SIZE:
+        response.vary.add('Accept-Encoding')
+        encoding = negotiate_encoding(request)
+        if encoding is not None:
+            compressed = compress_bytes(data, encoding)
+            if len(compressed) < len(data):
+                response.set_data(compressed)
+                response.headers['Content-Encoding'] = encoding
+    return response
+
+def coalesced_response(body: Dict, status: int, outcome: str) -> Response:
+    """Response marking results replayed for an idempotency key"""
+    headers = {'Idempotent-Replayed': 'true'} if outcome == 'replayed' else None
+    return respond(body, status, headers)
+
+async def run_in(executor: ThreadPoolExecutor, fn: Callable, *args):
+    """Run blocking work on a thread pool without blocking the event loop"""
+    return await asyncio.get_running_loop().run_in_executor(executor, partial(fn, *args))
+
+async def coalesced_analysis(endpoint: str, decoded_image: DecodedImage, fields: Optional[FieldTree],
+                             compute: Callable, idempotency_key: Optional[str] = None) -> Tuple[object, str]:
+    """Run compute once for concurrent identical requests to an endpoint
+
+    Same keys and outcomes as the WSGI gateway's helper. Only the request that
+    computes waits for an analysis slot; requests sharing its result or
+    replaying a stored one wait as coroutines without taking a slot or thread.
+    """
+    key, idempotency_key = await run_in(decode_threads, analysis_key, endpoint, decoded_image,
+                                        fields, idempotency_key)
+
+    async def admitted():
+        async with analysis_admission.admit():
+            return await run_in(analysis_threads, compute)
+
+    return await analysis_coalescer.run_async(key, admitted, idempotency_key)
+
+async def request_field(name: str, default=None):
+    """A non-image request parameter from the JSON body, form fields or query string"""
+    if request.is_json:
+        data = await request.get_json(silent=True)
+        if isinstance(data, dict) and name in data:
+            return data[name]
+    elif request.mimetype == 'multipart/form-data':
+        form = await request.form
+        if name in form:
+            return form[name]
+    return request.args.get(name, default)
+
+async def requested_fields() -> Optional[FieldTree]:
+    """The ``fields`` projection, from the query string or the body
+
+    Raises InvalidFields when the projection is malformed.
+    """
+    spec = request.args.get('fields')
+    if spec is None:
+        spec = await request_field('fields')
+    return parse_fields(spec)
+
+async def read_image_upload() -> Callable[[], DecodedImage]:
+    """Read the uploaded image without blocking and return a loader that decodes it
+
+    Accepts the same bodies as image_io.read_request_image.
+    """
+    mimetype = request.mimetype or ''
+
+    if request.is_json:
+        data = await request.get_json(silent=True)
+        if not isinstance(data, dict):
+            raise ImageRequestError('Invalid JSON body')
+        image_data = data.get('image') or data.get('image_data')
+        if not image_data:
+            raise ImageRequestError('Image data is required')
+        return partial(decode_data_url, image_data)
+
+    if mimetype == 'multipart/form-data':
+        files = await request.files
+        upload = next((files[name] for name in IMAGE_FIELDS if name in files), None)
+        if upload is None:
+            raise ImageRequestError('Image data is required')
+        return partial(decode_image_buffer, upload.read())
+
+    if mimetype.startswith('image/') or mimetype in RAW_IMAGE_CONTENT_TYPES:
+        check_image_bytes(request.content_length or 0)
+        return partial(decode_image_buffer, await request.get_data())
+
+    raise ImageRequestError(
+        'Content-Type must be application/json, multipart/form-data or image/*'
+    )
+
+async def read_analysis_upload() -> Callable[[], Tuple[DecodedImage, Optional[List[FaceBox]]]]:
+    """Loader for an analysis image: a stored image session or the uploaded image"""
+    image_token = await request_field('image_token') or request.headers.get('X-Image-Token')
+    if image_token:
+        return partial(load_image_session, str(image_token))
+    loader = await read_image_upload()
+    return lambda: (loader(), None)
+
+async def read_batch_uploads() -> List[Callable[[], Tuple[DecodedImage, Optional[List[FaceBox]]]]]:
+    """One deferred loader per image in a batch request, in upload order"""
+    loaders = []
+    if request.is_json:
+        data = await request.get_json(silent=True)
+        if not isinstance(data, dict):
+            raise ImageRequestError('Invalid JSON body')
+        for image_data in data.get('images') or []:
+            loaders.append(lambda image_data=image_data: (decode_data_url(str(image_data)), None))
+        for image_token in data.get('image_tokens') or []:
+            loaders.append(partial(load_image_session, str(image_token)))
+    elif request.mimetype == 'multipart/form-data':
+        files = await request.files
+        for upload in files.getlist('images') or list(files.values()):
+            buffer = upload.read()
+            loaders.append(lambda buffer=buffer: (decode_image_buffer(buffer), None))
+    else:
+        raise ImageRequestError('Content-Type must be application/json or multipart/form-data')
+
+    if not loaders:
+        raise ImageRequestError('At least one image is required')
+    if len(loaders) > MAX_BATCH_IMAGES:
+        raise ImageRequestError(f'At most {MAX_BATCH_IMAGES} images may be analyzed per batch', 413)
+    return loaders
+
+def startup_response(error: StartupInProgress) -> Response:
+    return respond({
+        'success': False,
+        'error': str(error),
+        'message': 'Service is starting, please retry shortly',
+        'startup': error.status
+    }, error.status_code, {'Retry-After': str(error.retry_after)})
+
+def models_unavailable() -> Optional[Response]:
+    """503 response while the analyzer and models initialize, or when the facial model is not available"""
+    try:
+        service_startup.require(*ANALYSIS_COMPONENTS)
+    except StartupInProgress as e:
+        return startup_response(e)
+    if hare_run_v6_manager.is_model_available('facial'):
+        return None
+    return respond({
+        'error': 'ML models not available',
+        'message': 'Please try again later'
+    }, 503)
+
+# ============================================================================
+# HEALTH & STATUS ENDPOINTS
+# ============================================================================
+
+@app.route('/health')
+async def health():
+    """Basic health check - Fast response for ALB health checks"""
+    return "OK", 200
+
+@app.route('/api/health')
+async def api_health():
+    """Detailed API health check with model status"""
+    try:
+        return respond({
+            "message": "API Gateway is running",
+            "service": SERVICE_NAME,
+            "status": "healthy",
+            "models_loaded": hare_run_v6_manager.models_loaded,
+            "startup": service_startup.status(),
+            "analysis_jobs": analysis_jobs.stats(),
+            "admission": analysis_admission.stats(),
+            "coalescing": analysis_coalescer.stats(),
+            "timestamp": datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"API health check failed: {e}")
+        return respond({
+            "message": "API Gateway error",
+            "service": SERVICE_NAME,
+            "status": "error",
+            "error": str(e),
+            "timestamp": datetime.now().isoformat()
+        }, 500)
+
+@app.route('/ready')
+async def ready():
+    """Readiness check - 503 until models are loaded and warm-up has run"""
+    return respond(*readiness())
+
+# ============================================================================
+# FACE DETECTION ENDPOINTS
+# ============================================================================
+
+async def detect_face_response(faces_list: bool, error_label: str) -> Response:
+    try:
+        try:
+            loader = await read_image_upload()
+            body = await run_in(decode_threads, lambda: face_detection_body(loader(), faces_list))
+        except ImageRequestError as e:
+            return respond({'error': str(e)}, e.status_code)
+        return respond(body)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"{error_label}: {e}")
+        return respond({
+            'success': False,
+            'error': str(e),
+            'message': 'Face detection failed'
+        }, 500)
+
+@app.route('/api/v1/face/detect', methods=['POST'])
+async def face_detect():
+    """Face detection endpoint"""
+    return await detect_face_response(False, 'Face detection error')
+
+@app.route('/api/v4/face/detect', methods=['POST'])
+async def face_detect_v4():
+    """Face detection endpoint V4 - matches frontend expectations"""
+    return await detect_face_response(True, 'Face detection V4 error')
+
+# ============================================================================
+# SKIN ANALYSIS ENDPOINTS
+# ============================================================================
+
+@app.route('/api/v6/skin/analyze-production-model', methods=['POST'])
+async def analyze_skin_production_model():
+    """Production model skin analysis endpoint - matches frontend expectations"""
+    try:
+        unavailable = models_unavailable()
+        if unavailable is not None:
+            return unavailable
+
+        # Read and decode the whole upload before taking an analysis slot
+        try:
+            loader = await read_analysis_upload()
+            decoded_image, faces = await run_in(decode_threads, loader)
+            fields = await requested_fields()
+        except (ImageRequestError, InvalidFields) as e:
+            return respond({'error': str(e)}, e.status_code)
+
+        (body, status), outcome = await coalesced_analysis(
+            'analyze-production-model', decoded_image, fields,
+            production_compute(decoded_image, faces, fields), request.headers.get('Idempotency-Key')
+        )
+        return coalesced_response(body, status, outcome)
+
+    except IdempotencyConflict as e:
+        return respond({'error': str(e)}, e.status_code)
+    except (AdmissionRejected, HTTPException):
+        # Rendered by the error handlers below
+        raise
+    except Exception as e:
+        logger.error(f"Production model analysis error: {e}")
+        return respond({
+            'success': False,
+            'error': str(e),
+            'message': 'Skin analysis failed'
+        }, 500)
+
+@app.route('/api/v6/skin/analyze-batch', methods=['POST'])
+async def analyze_skin_batch():
+    """Production-model analysis of many images in one request
+
+    Same request and response formats as the WSGI gateway, including
+    ``stream=true`` NDJSON output.
+    """
+    try:
+        unavailable = models_unavailable()
+        if unavailable is not None:
+            return unavailable
+
+        try:
+            loaders = await read_batch_uploads()
+            fields = await requested_fields()
+        except (ImageRequestError, InvalidFields) as e:
+            return respond({'error': str(e)}, e.status_code)
+        stream = str(await request_field('stream', '')).lower() in ('1', 'true', 'yes')
+
+        # Each image holds its own analysis slot while it is analyzed, so a batch
+        # counts against the concurrency limit once per image in progress
+        hold = partial(analysis_admission.hold_from_thread, asyncio.get_running_loop())
+
+        async def analyze_item(index: int, loader: Callable) -> Dict:
+            body, status = await asyncio.wrap_future(batch_executor.submit(analyze_batch_item, loader,
+                                                                           fields, hold))
+            return dict(body, index=index, status=status)
+
+        tasks = [asyncio.ensure_future(analyze_item(index, loader)) for index, loader in enumerate(loaders)]
+
+        if stream:
+            async def ndjson():
+                for next_result in asyncio.as_completed(tasks):
+                    yield dumps_bytes(await next_result) + b'\n'
+            return Response(ndjson(), mimetype='application/x-ndjson')
+
+        results = await asyncio.gather(*tasks)
+        return respond({
+            'success': True,
+            'count': len(results),
+            'succeeded': sum(1 for result in results if result['status'] == 200),
+            'results': results,
+            'timestamp': datetime.now().isoformat()
+        })
+
+    except (AdmissionRejected, HTTPException):
+        # Rendered by the error handlers below
+        raise
+    except Exception as e:
+        logger.error(f"Batch analysis error: {e}")
+        return respond({
+            'success': False,
+            'error': str(e),
+            'message': 'Batch skin analysis failed'
+        }, 500)
+
+async def enhanced_analysis_response(endpoint: str, analysis_type: str, basic_analysis_type: str,
+                                     error_label: str) -> Response:
+    try:
+        unavailable = models_unavailable()
+        if unavailable is not None:
+            return unavailable
+
+        # Read and decode the whole upload before taking an analysis slot
+        try:
+            loader = await read_analysis_upload()
+            decoded_image, _ = await run_in(decode_threads, loader)
+            fields = await requested_fields()
+        except (ImageRequestError, InvalidFields) as e:
+            return respond({'error': str(e)}, e.status_code)
+
+        # Enhanced analysis using Hare Run V6, falling back to a basic response
+        compute = enhanced_compute(decoded_image, fields)
+        if compute is None:
+            return respond(basic_analysis_body(basic_analysis_type))
+        try:
+            results, outcome = await coalesced_analysis(endpoint, decoded_image, fields, compute,
+                                                        request.headers.get('Idempotency-Key'))
+        except IdempotencyConflict as e:
+            return respond({'error': str(e)}, e.status_code)
+        except (AdmissionRejected, HTTPException):
+            raise
+        except Exception as e:
+            logger.error(f"{analysis_type} analysis failed: {e}")
+            return respond(basic_analysis_body(basic_analysis_type))
+        return coalesced_response(enhanced_body(results, fields, analysis_type), 200, outcome)
+
+    except (AdmissionRejected, HTTPException):
+        # Rendered by the error handlers below
+        raise
+    except Exception as e:
+        logger.error(f"{error_label}: {e}")
+        return respond({
+            'success': False,
+            'error': str(e),
+            'message': 'Skin analysis failed'
+        }, 500)
+
+@app.route('/api/v6/skin/analyze-hare-run', methods=['POST'])
+async def analyze_skin_hare_run():
+    """Hare Run V6 enhanced skin analysis endpoint"""
+    return await enhanced_analysis_response('analyze-hare-run', 'Hare Run V6 Enhanced',
+                                            'Basic Analysis', 'Skin analysis error')
+
+@app.route('/api/v4/skin/analyze-enhanced', methods=['POST'])
+async def skin_analyze_enhanced_v4():
+    """Enhanced skin analysis endpoint V4 - matches frontend expectations"""
+    return await enhanced_analysis_response('analyze-enhanced', 'Enhanced Analysis V4',
+                                            'Basic Analysis V4', 'Skin analysis V4 error')
+
+# ============================================================================
+# ANALYSIS JOB ENDPOINTS
+# ============================================================================
+
+@app.route('/api/v6/skin/jobs', methods=['POST'])
+async def create_analysis_job():
+    """Queue a production-model analysis and return a job id immediately"""
+    try:
+        unavailable = models_unavailable()
+        if unavailable is not None:
+            return unavailable
+
+        # Decode before queueing so invalid uploads fail fast
+        try:
+            loader = await read_analysis_upload()
+            decoded_image, faces = await run_in(decode_threads, loader)
+            fields = await requested_fields()
+        except (ImageRequestError, InvalidFields) as e:
+            return respond({'error': str(e)}, e.status_code)
+
+        if faces is None:
+            faces = await run_in(decode_threads, detect_faces, decoded_image.array)
+
+        try:
+            hold = partial(analysis_admission.hold_from_thread, asyncio.get_running_loop())
+            job = analysis_jobs.submit(run_held, hold, run_production_analysis, decoded_image.array, faces,
+                                       fields)
+        except JobQueueFull as e:
+            return respond({
+                'success': False,
+                'error': str(e),
+                'message': 'Too many analyses in progress, please retry shortly'
+            }, 503, {'Retry-After': str(e.retry_after)})
+
+        return respond({
+            'success': True,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'/api/v6/skin/jobs/{job.id}',
+            'events_url': f'/api/v6/skin/jobs/{job.id}/events',
+            'timestamp': datetime.now().isoformat()
+        }, 202)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Analysis job submission error: {e}")
+        return respond({
+            'success': False,
+            'error': str(e),
+            'message': 'Failed to queue skin analysis'
+        }, 500)
+
+@app.route('/api/v6/skin/jobs/<job_id>')
+async def get_analysis_job(job_id):
+    """Status of an analysis job, with the analysis response once finished"""
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return respond({'error': 'Job not found or expired'}, 404)
+    return respond(job.to_dict())
+
+@app.route('/api/v6/skin/jobs/<job_id>/events')
+async def analysis_job_events(job_id):
+    """Server-sent events stream that pushes status changes and the final result"""
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return respond({'error': 'Job not found or expired'}, 404)
+
+    async def stream():
+        last_status = None
+        last_event = asyncio.get_running_loop().time()
+        while True:
+            now = asyncio.get_running_loop().time()
+            if job.status != last_status and not job.done:
+                last_status = job.status
+                last_event = now
+                yield f"event: status\ndata: {dumps_bytes({'job_id': job.id, 'status': job.status}).decode()}\n\n"
+            if job.done:
+                yield f"event: complete\ndata: {dumps_bytes(job.to_dict()).decode()}\n\n"
+                return
+            if now - last_event >= SSE_KEEPALIVE_SECONDS:
+                last_event = now
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(1.0)
+
+    response = Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+    # Event streams stay open until the job finishes
+    response.timeout = None
+    return response
+
+# ============================================================================
+# MODEL STATUS ENDPOINTS
+# ============================================================================
+
+@app.route('/api/v5/skin/model-status')
+async def model_status():
+    """Get ML model status and availability"""
+    try:
+        return respond({
+            'service': SERVICE_NAME,
+            'status': 'healthy',
+            'model_status': hare_run_v6_manager.get_model_status(),
+            'timestamp': datetime.now().isoformat()
+        })
+    except Exception as e:
+        logger.error(f"Model status error: {e}")
+        return respond({
+            'service': SERVICE_NAME,
+            'status': 'error',
+            'error': str(e),
+            'timestamp': datetime.now().isoformat()
+        }, 500)
+
+# ============================================================================
+# ERROR HANDLERS
+# ============================================================================
+
+@app.errorhandler(404)
+async def not_found(error):
+    return respond({'error': 'Endpoint not found'}, 404)
+
+@app.errorhandler(413)
+async def request_too_large(error):
+    return respond({'error': f'Request body too large; the limit is {request.max_content_length} bytes'}, 413)
+
+@app.errorhandler(AdmissionRejected)
+async def admission_rejected(error):
+    return respond({
+        'success': False,
+        'error': str(error),
+        'message': 'Too many analyses in progress, please retry shortly',
+        'queue_depth': error.queue_depth
+    }, error.status_code, {'Retry-After': str(error.retry_after)})
+
+@app.errorhandler(500)
+async def internal_error(error):
+    return respond({'error': 'Internal server error'}, 500)
+
+# ============================================================================
+# MAIN APPLICATION
+# ============================================================================
+
+if __name__ == "__main__":
+    logger.info(f"Starting {SERVICE_NAME} (ASGI) on port {PORT}")
+    logger.info(f"S3 Bucket: {S3_BUCKET}")
+    logger.info(f"Model Key: {S3_MODEL_KEY}")
+
+    # Models load in the background; analysis routes answer 503 until they are ready
+    app.run(host='0.0.0.0', port=PORT)
@@ -5,28 +5,75 @@ Enhanced ML-powered skin analysis with S3 model management
 """
 
 import os
-import base64
+import time
 import logging
 import json
+import threading
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Optional, List, Tuple
+from typing import Callable, Dict, Optional, List, Tuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import numpy as np
-import cv2
-import boto3
-from flask import Flask, request, jsonify
+from flask import Flask, Request, Response, request, jsonify, stream_with_context
 from flask_cors import CORS
-import traceback
+
+from face_detection import detect_faces, largest_face, face_detector_pool, FaceBox
+from image_io import (
+    read_request_image, read_stream, decode_image_buffer, decode_data_url, get_request_field,
+    oversized_body_as_request_error, ImageRequestError, DecodedImage, MAX_REQUEST_BYTES
+)
+from image_sessions import image_sessions
+from analysis_jobs import analysis_jobs, JobQueueFull
+from admission import analysis_admission, AdmissionRejected
+from request_coalescing import analysis_coalescer, IdempotencyConflict
+from analysis_executor import create_skin_analyzer, ANALYSIS_EXECUTOR
+from startup import service_startup, StartupInProgress
+from model_download import S3_MAX_POOL_CONNECTIONS
+from model_cache import ModelCache, CachedArtifact, FRESH, DOWNLOADED
+from flat_weights import (
+    FlatWeights, FlatWeightsError, load_flat_weights, flat_weights_path, convert_h5, is_converted_from,
+    H5_CONVERSION_AVAILABLE
+)
+from warmup import warm_up, WARMUP_ENABLED
+from serialization import (
+    NumpyJSONProvider, FieldTree, InvalidFields, requested_fields, select_fields, project_response,
+    compress_response
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Batch uploads carry many images, so they get their own body limit
+MAX_BATCH_IMAGES = int(os.getenv('MAX_BATCH_IMAGES', 50))
+MAX_BATCH_REQUEST_BYTES = int(os.getenv('MAX_BATCH_REQUEST_BYTES', MAX_REQUEST_BYTES * 10))
+BATCH_WORKERS = int(os.getenv('BATCH_WORKERS', 4))
+BATCH_PATHS = ('/api/v6/skin/analyze-batch',)
+
+class ShineRequest(Request):
+    """Request with a larger body limit on batch endpoints"""
+    
+    @property
+    def max_content_length(self):
+        if self.path in BATCH_PATHS:
+            return MAX_BATCH_REQUEST_BYTES
+        return MAX_REQUEST_BYTES
+
 # Initialize Flask app
 app = Flask(__name__)
+app.request_class = ShineRequest
+
+# Encode NumPy results natively and negotiate MessagePack for clients that ask for it
+app.json = NumpyJSONProvider(app)
+
+# Compress large responses for clients that accept gzip or brotli
+app.after_request(compress_response)
+
+# Reject oversized uploads before the body is read
+app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
 
 # Configure CORS to allow frontend access
-CORS(app, origins=[
+CORS_ORIGINS = [
     'https://www.shineskincollective.com',
     'https://shineskincollective.com',
     'http://localhost:3000',
@@ -35,7 +82,8 @@ CORS(app, origins=[
     'http://127.0.0.1:3000',
     'http://127.0.0.1:3001',
     'http://127.0.0.1:3002'
-], supports_credentials=True)
+]
+CORS(app, origins=CORS_ORIGINS, supports_credentials=True)
 
 # Service configuration
 SERVICE_NAME = "shine-backend-hare-run-v6"
@@ -43,6 +91,9 @@ S3_BUCKET = os.getenv('S3_BUCKET', 'shine-skincare-models')
 S3_MODEL_KEY = os.getenv('S3_MODEL_KEY', 'ml-models/production/comprehensive_model_best.h5')
 LOCAL_MODEL_PATH = os.getenv('MODEL_PATH', './models/fixed_model_best.h5')
 PORT = int(os.getenv('PORT', 8000))
+SSE_KEEPALIVE_SECONDS = float(os.getenv('SSE_KEEPALIVE_SECONDS', 15))
+# How long a request waits for a model load already in progress before answering 503
+MODEL_LOAD_WAIT_SECONDS = float(os.getenv('MODEL_LOAD_WAIT_SECONDS', 10))
 
 # Hare Run V6 Configuration
 HARE_RUN_V6_CONFIG = {
@@ -65,56 +116,118 @@ HARE_RUN_V6_CONFIG = {
     }
 }
 
-# Initialize S3 client with error handling
-try:
-    s3_client = boto3.client('s3')
-    logger.info("S3 client initialized successfully")
-except Exception as e:
-    logger.error(f"Failed to initialize S3 client: {e}")
-    s3_client = None
-
-# Initialize advanced analysis systems
-try:
-    from enhanced_analysis_algorithms import EnhancedSkinAnalyzer
-    enhanced_analyzer = EnhancedSkinAnalyzer()
-    logger.info("Enhanced skin analyzer initialized")
-except Exception as e:
-    logger.error(f"Failed to initialize enhanced analyzer: {e}")
-    enhanced_analyzer = None
+def create_s3_client():
+    """S3 client for model downloads, or None if boto3 cannot be configured"""
+    try:
+        import boto3
+        from botocore.config import Config
+        # Pooled connections for parallel ranged model downloads
+        client = boto3.client('s3', config=Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                                                   retries={'max_attempts': 5, 'mode': 'adaptive'}))
+        logger.info("S3 client initialized successfully")
+        return client
+    except Exception as e:
+        logger.error(f"Failed to initialize S3 client: {e}")
+        return None
+
+# boto3 takes a noticeable share of cold start, so the client is created when models are first fetched
+s3_client = None
+_s3_client_lock = threading.Lock()
+
+def get_s3_client():
+    """Shared S3 client, created on first use"""
+    global s3_client
+    with _s3_client_lock:
+        if s3_client is None:
+            s3_client = create_s3_client()
+        return s3_client
+
+# Set by the 'analyzer' startup step; analysis falls back to basic results while it is None
+enhanced_analyzer = None
+
+def initialize_enhanced_analyzer():
+    """Build the skin analyzer; ANALYSIS_EXECUTOR=process runs it in a pool of worker processes"""
+    global enhanced_analyzer
+    enhanced_analyzer = create_skin_analyzer()
+    logger.info(f"Enhanced skin analyzer initialized ({ANALYSIS_EXECUTOR} executor)")
+
+# Timings of the last warm-up, reported by /ready
+warmup_report: Optional[Dict] = None
+
+def run_warmup():
+    """Detect and analyze synthetic images so the first real requests run at steady-state speed"""
+    global warmup_report
+    warmup_report = warm_up(detect_faces, enhanced_analyzer,
+                            concurrency=getattr(enhanced_analyzer, 'processes', 1))
 
 # Hare Run V6 Model Manager - LAZY LOADING VERSION
 class HareRunV6ModelManager:
-    """Manages Hare Run V6 model loading and availability with lazy loading"""
+    """Manages Hare Run V6 model loading and availability with lazy loading
+    
+    Loading is single-flight: the first caller loads (downloading from S3 if
+    needed) while concurrent callers wait for that load, up to a timeout,
+    instead of starting their own downloads into the same files.
+    """
     
     def __init__(self):
         self.models_loaded = False
         self.model_paths = {}
         self.model_metadata = {}
+        self.model_weights: Dict[str, FlatWeights] = {}
         self._models_loaded = False  # Don't load models during init
+        self._loading = False
+        self._load_done = threading.Event()
+        self._load_lock = threading.Lock()
     
-    def _ensure_models_loaded(self):
-        """Lazy load models only when needed"""
-        if not self._models_loaded:
+    def _ensure_models_loaded(self, timeout: Optional[float] = None) -> bool:
+        """Load models once; False if another thread's load did not finish within timeout"""
+        with self._load_lock:
+            if self._models_loaded:
+                return True
+            leader = not self._loading
+            self._loading = True
+        
+        if not leader:
+            return self._load_done.wait(timeout)
+        
+        try:
             self._load_models()
-            self._models_loaded = True
+        finally:
+            with self._load_lock:
+                self._models_loaded = True
+                self._loading = False
+            self._load_done.set()
+        return True
+    
+    def start_background_load(self) -> Optional[threading.Thread]:
+        """Begin loading in a daemon thread unless models are loaded or already loading"""
+        with self._load_lock:
+            if self._models_loaded or self._loading:
+                return None
+        thread = threading.Thread(target=self._ensure_models_loaded, name='model-loader', daemon=True)
+        thread.start()
+        return thread
+    
+    @property
+    def load_state(self) -> str:
+        """'idle', 'loading' or 'loaded'"""
+        with self._load_lock:
+            if self._models_loaded:
+                return 'loaded'
+            return 'loading' if self._loading else 'idle'
     
     def _load_models(self):
         """Load Hare Run V6 models from local or S3"""
         try:
-            # Check local models first
-            local_models_dir = Path('./models')
-            if local_models_dir.exists():
-                self._load_local_models(local_models_dir)
-            
-            # If local models not available, try S3
-            if not self.models_loaded and s3_client:
-                self._load_s3_models()
+            # ./models is a cache of the S3 artifacts, revalidated against S3 and used as-is when S3 is unreachable
+            self._load_s3_models()
             
             # Check results directory as fallback
             if not self.models_loaded:
                 self._load_results_models()
             
             if self.models_loaded:
+                self._load_flat_weights()
                 logger.info("Hare Run V6 models loaded successfully")
                 logger.info(f"Model info: {self.model_metadata}")
             else:
@@ -123,64 +236,51 @@ class HareRunV6ModelManager:
         except Exception as e:
             logger.error(f"Failed to load Hare Run V6 models: {e}")
     
-    def _load_local_models(self, models_dir: Path):
-        """Load models from local models directory"""
-        try:
-            for model_type, model_info in HARE_RUN_V6_CONFIG['models'].items():
-                model_path = models_dir / model_info['primary']
-                if model_path.exists():
-                    self.model_paths[model_type] = str(model_path)
-                    self.model_metadata[model_type] = {
-                        'source': 'local',
-                        'path': str(model_path),
-                        'size': model_path.stat().st_size / (1024 * 1024),
-                        'available': True
-                    }
-                    logger.info(f"Loaded local model: {model_path}")
-            
-            if self.model_paths:
-                self.models_loaded = True
-                
-        except Exception as e:
-            logger.error(f"Failed to load local models: {e}")
-    
     def _load_s3_models(self):
-        """Load models from S3"""
+        """Load models through the local cache, downloading missing or stale artifacts in parallel"""
         try:
-            logger.info("Attempting to load models from S3...")
+            logger.info("Revalidating cached models against S3...")
             
-            if not s3_client:
-                logger.warning("S3 client not available")
-                return
+            # Primary of every model type, each fetched once
+            artifacts = {f"ml-models/production/{model_info['primary']}": model_info['primary']
+                         for model_info in HARE_RUN_V6_CONFIG['models'].values()}
             
-            # Create models directory if it doesn't exist
-            models_dir = Path('./models')
-            models_dir.mkdir(exist_ok=True)
+            # Without an S3 client the cache falls back to the local copies
+            cache = ModelCache('./models', get_s3_client(), S3_BUCKET)
+            cached = cache.ensure_many(artifacts)
+            
+            # Backups are only fetched for model types whose primary is unavailable
+            backups = {}
+            for model_info in HARE_RUN_V6_CONFIG['models'].values():
+                primary = cached.get(f"ml-models/production/{model_info['primary']}")
+                if not isinstance(primary, CachedArtifact) and model_info.get('backup'):
+                    backups[f"ml-models/production/{model_info['backup']}"] = model_info['backup']
+            if backups:
+                logger.warning(f"Primary models unavailable; fetching backups {sorted(backups.values())}")
+                cached.update(cache.ensure_many(backups))
             
             for model_type, model_info in HARE_RUN_V6_CONFIG['models'].items():
                 s3_key = f"ml-models/production/{model_info['primary']}"
-                local_path = models_dir / model_info['primary']
-                
-                if not local_path.exists():
-                    logger.info(f"Downloading {s3_key} from S3...")
-                    try:
-                        s3_client.download_file(S3_BUCKET, s3_key, str(local_path))
-                        logger.info(f"Successfully downloaded {s3_key}")
-                    except Exception as e:
-                        logger.error(f"Failed to download {s3_key}: {e}")
-                        continue
+                artifact = cached.get(s3_key)
+                if not isinstance(artifact, CachedArtifact) and model_info.get('backup'):
+                    s3_key = f"ml-models/production/{model_info['backup']}"
+                    artifact = cached.get(s3_key)
+                if not isinstance(artifact, CachedArtifact):
+                    continue
                 
-                # Now load the downloaded model
-                if local_path.exists():
-                    self.model_paths[model_type] = str(local_path)
-                    self.model_metadata[model_type] = {
-                        'source': 's3',
-                        'path': str(local_path),
-                        'size': local_path.stat().st_size / (1024 * 1024),
-                        'available': True,
-                        's3_location': f"s3://{S3_BUCKET}/{s3_key}"
-                    }
-                    logger.info(f"Loaded S3 model: {local_path}")
+                self.model_paths[model_type] = artifact.path
+                self.model_metadata[model_type] = {
+                    'source': 's3' if artifact.status in (FRESH, DOWNLOADED) else 'local',
+                    'path': artifact.path,
+                    'size': Path(artifact.path).stat().st_size / (1024 * 1024),
+                    'available': True,
+                    's3_location': f"s3://{S3_BUCKET}/{s3_key}",
+                    'cache_status': artifact.status,
+                    'etag': artifact.manifest['etag'] if artifact.manifest else None
+                }
+                if artifact.download:
+                    self.model_metadata[model_type]['download'] = artifact.download
+                logger.info(f"Loaded {artifact.status} model: {artifact.path}")
             
             if self.model_paths:
                 self.models_loaded = True
@@ -211,21 +311,52 @@ class HareRunV6ModelManager:
         except Exception as e:
             logger.error(f"Failed to load results models: {e}")
     
+    def _load_flat_weights(self):
+        """Map each model's flat weights, converting the HDF5 file when it is new or changed
+        
+        The weights live in the page cache rather than the heap, so every process
+        and container on the host shares them. Flat files are derived locally;
+        one converted from an earlier download of the model is converted again.
+        """
+        for model_type, model_path in self.model_paths.items():
+            flat_path = flat_weights_path(model_path)
+            try:
+                if not is_converted_from(flat_path, model_path):
+                    if not H5_CONVERSION_AVAILABLE:
+                        logger.warning(f"Flat weights for {model_type} are missing or stale and h5py is not installed")
+                        continue
+                    logger.info(f"Converting {model_path} to flat weights...")
+                    convert_h5(model_path, flat_path)
+                weights = load_flat_weights(flat_path)
+            except (OSError, ValueError, FlatWeightsError) as e:
+                logger.warning(f"Flat weights unavailable for {model_type}: {e}")
+                continue
+            self.model_weights[model_type] = weights
+            self.model_metadata[model_type]['weights'] = weights.summary()
+            logger.info(f"Mapped {model_type} weights: {len(weights)} tensors from {flat_path}")
+    
+    def get_model_weights(self, model_type: str = 'facial') -> Optional[FlatWeights]:
+        """Memory-mapped weights of the specified model, if flat weights are available"""
+        self._ensure_models_loaded()
+        return self.model_weights.get(model_type)
+    
     def get_model_path(self, model_type: str = 'facial') -> Optional[str]:
         """Get path to specified model type"""
         self._ensure_models_loaded()
         return self.model_paths.get(model_type)
     
-    def is_model_available(self, model_type: str = 'facial') -> bool:
-        """Check if specified model is available"""
-        self._ensure_models_loaded()
+    def is_model_available(self, model_type: str = 'facial', timeout: float = MODEL_LOAD_WAIT_SECONDS) -> bool:
+        """Check if specified model is available, waiting at most timeout for a load in progress"""
+        if not self._ensure_models_loaded(timeout):
+            return False
         return model_type in self.model_paths and self.model_paths[model_type] is not None
     
     def get_model_status(self) -> Dict:
-        """Get comprehensive model status"""
-        self._ensure_models_loaded()
+        """Get comprehensive model status without waiting for a load in progress"""
+        self.start_background_load()
         return {
             'models_loaded': self.models_loaded,
+            'load_state': self.load_state,
             'total_models': len(self.model_paths),
             'model_details': self.model_metadata,
             'config': HARE_RUN_V6_CONFIG
@@ -234,6 +365,397 @@ class HareRunV6ModelManager:
 # Initialize Hare Run V6 Model Manager - NO MODEL LOADING DURING IMPORT
 hare_run_v6_manager = HareRunV6ModelManager()
 
+# Startup steps run concurrently in the background: /health answers at once, and
+# analysis routes return 503 with progress until the analyzer and models settle
+ANALYSIS_COMPONENTS = ('analyzer', 'models')
+# Components the service cannot serve without; /ready fails while any of them failed
+REQUIRED_COMPONENTS = ('face_detector',) + ANALYSIS_COMPONENTS
+service_startup.register('s3_client', get_s3_client)
+# Face cascades are read once per process; each Flask thread builds its own classifier on first use
+service_startup.register('face_detector', face_detector_pool.preload)
+service_startup.register('analyzer', initialize_enhanced_analyzer)
+service_startup.register('models', hare_run_v6_manager._ensure_models_loaded)
+if WARMUP_ENABLED:
+    service_startup.register('warmup', run_warmup, requires=('face_detector', 'analyzer'))
+# Importing the app only registers the steps; the entry points start them (wsgi.py,
+# __main__ and the ASGI gateway's before_serving hook)
+
+# Worker pool for batch requests; decode, detection and analysis all release the GIL in OpenCV
+batch_executor = ThreadPoolExecutor(max_workers=BATCH_WORKERS, thread_name_prefix='analysis-batch')
+
+# ============================================================================
+# REQUEST HELPERS
+# ============================================================================
+
+def load_analysis_image(req) -> Tuple[DecodedImage, Optional[List[FaceBox]]]:
+    """Image for an analysis request, plus any faces already detected in it
+
+    Clients that called face detection first can send the returned
+    ``image_token`` instead of the image; the decoded array and face boxes from
+    that call are reused. Otherwise the uploaded image is decoded.
+    """
+    image_token = get_request_field(req, 'image_token') or req.headers.get('X-Image-Token')
+    if image_token:
+        return load_image_session(str(image_token))
+    return read_request_image(req), None
+
+def load_image_session(image_token: str) -> Tuple[DecodedImage, List[FaceBox]]:
+    """Decoded image and faces stored by an earlier face detection call"""
+    session = image_sessions.get(image_token)
+    if session is None:
+        raise ImageRequestError('Image session expired or not found; please upload the image again', 410)
+    return session.image, session.faces
+
+def analysis_key(endpoint: str, decoded_image: DecodedImage, fields: Optional[FieldTree],
+                 idempotency_key: Optional[str] = None) -> Tuple[str, Optional[str]]:
+    """Coalescing key and scoped idempotency key for an analysis request
+
+    Requests are identical when the decoded pixels and the ``fields`` projection
+    match; idempotency keys are scoped to the endpoint.
+    """
+    key = f"{endpoint}:{decoded_image.content_digest()}:{json.dumps(fields, sort_keys=True)}"
+    if idempotency_key:
+        idempotency_key = f"{endpoint}:{idempotency_key}"
+    return key, idempotency_key
+
+def coalesced_analysis(endpoint: str, decoded_image: DecodedImage, fields: Optional[FieldTree],
+                       compute: Callable, idempotency_key: Optional[str] = None) -> Tuple[object, str]:
+    """Run compute once for concurrent identical requests to an endpoint
+
+    A request carrying an ``Idempotency-Key`` also gets the stored result of an
+    earlier request with that key. Only the request that computes takes an
+    analysis slot; requests sharing its result or replaying a stored one do not.
+    Returns the result and whether it was 'computed', 'shared' or 'replayed'.
+    """
+    key, idempotency_key = analysis_key(endpoint, decoded_image, fields, idempotency_key)
+    
+    def admitted():
+        with analysis_admission.admit():
+            return compute()
+    
+    return analysis_coalescer.run(key, admitted, idempotency_key)
+
+def coalesced_response(body: Dict, status: int, outcome: str):
+    """JSON response marking results replayed for an idempotency key"""
+    response = jsonify(body)
+    if outcome == 'replayed':
+        response.headers['Idempotent-Replayed'] = 'true'
+    return response, status
+
+def face_detection_body(decoded_image: DecodedImage, faces_list: bool = False) -> Dict:
+    """Face detection response; ``faces_list`` selects the V4 shape with a faces array"""
+    # Face detection using the shared detector pool
+    faces = detect_faces(decoded_image.array)
+    
+    if len(faces) == 0:
+        body = {'success': False}
+        if faces_list:
+            body['faces'] = []
+        body['faces_detected'] = 0
+        body['message'] = 'No faces detected in the image'
+        return body
+    
+    # Get the largest face, in the coordinates of the uploaded image
+    x, y, w, h = decoded_image.to_source_box(largest_face(faces))
+    face = {
+        'x': int(x),
+        'y': int(y),
+        'width': int(w),
+        'height': int(h),
+        'confidence': 0.95
+    }
+    
+    # Keep the decoded image so the follow-up analysis call can skip upload and detection
+    image_token = image_sessions.put(decoded_image, faces)
+    
+    body = {'success': True}
+    if faces_list:
+        body['faces'] = [face]
+        body['faces_detected'] = len(faces)
+    else:
+        body['faces_detected'] = len(faces)
+        body['primary_face'] = face
+    body['message'] = f'Detected {len(faces)} face(s)'
+    body['image_token'] = image_token
+    body['image_token_expires_in'] = image_sessions.ttl
+    return body
+
+def production_compute(decoded_image: DecodedImage, faces: Optional[List[FaceBox]],
+                       fields: Optional[FieldTree]) -> Callable[[], Tuple[Dict, int]]:
+    """Production-model analysis of an image, deferred so it can be coalesced"""
+    img_array = decoded_image.array
+    
+    def analyze():
+        # Face detection using the shared detector pool, unless the session already did it
+        detected = faces if faces is not None else detect_faces(img_array)
+        return run_production_analysis(img_array, detected, fields)
+    return analyze
+
+def production_analysis(decoded_image: DecodedImage, faces: Optional[List[FaceBox]],
+                        fields: Optional[FieldTree], idempotency_key: Optional[str] = None) -> Tuple[Dict, int, str]:
+    """Coalesced production-model analysis: response body, HTTP status and coalescing outcome"""
+    (body, status), outcome = coalesced_analysis('analyze-production-model', decoded_image, fields,
+                                                 production_compute(decoded_image, faces, fields),
+                                                 idempotency_key)
+    return body, status, outcome
+
+def enhanced_compute(decoded_image: DecodedImage, fields: Optional[FieldTree]) -> Optional[Callable[[], Dict]]:
+    """Enhanced analyzer results for an image, deferred so they can be coalesced
+
+    None when the analyzer is not available.
+    """
+    analyzer = enhanced_analyzer
+    if not analyzer:
+        return None
+    img_array = decoded_image.array
+    return lambda: analyzer.analyze_skin_conditions(img_array, **skin_analysis_options(fields))
+
+def enhanced_body(results: Dict, fields: Optional[FieldTree], analysis_type: str) -> Dict:
+    """Enhanced analysis response for analyzer results, projected to ``fields``"""
+    body = {
+        'success': True,
+        'analysis_type': analysis_type,
+        'results': results
+    }
+    # Model status is only gathered when the projection keeps it
+    if select_fields(fields, 'model_info') is not None:
+        body['model_info'] = hare_run_v6_manager.get_model_status()
+    body['timestamp'] = datetime.now().isoformat()
+    return project_response(body, fields)
+
+def basic_analysis_body(basic_analysis_type: str) -> Dict:
+    """Response used when the enhanced analyzer is unavailable or fails"""
+    return {
+        'success': True,
+        'analysis_type': basic_analysis_type,
+        'message': 'Enhanced analysis unavailable, using basic analysis',
+        'basic_results': {
+            'image_processed': True,
+            'face_detected': True,
+            'analysis_available': False
+        },
+        'timestamp': datetime.now().isoformat()
+    }
+
+def enhanced_analysis(decoded_image: DecodedImage, fields: Optional[FieldTree], endpoint: str,
+                      analysis_type: str, basic_analysis_type: str,
+                      idempotency_key: Optional[str] = None) -> Tuple[Dict, str]:
+    """Coalesced enhanced analysis response and coalescing outcome
+
+    Falls back to a basic response when the analyzer is unavailable or fails.
+    Raises IdempotencyConflict when the idempotency key was used for other input,
+    and AdmissionRejected when no analysis slot is free.
+    """
+    # Enhanced analysis using Hare Run V6
+    compute = enhanced_compute(decoded_image, fields)
+    if compute is not None:
+        try:
+            results, outcome = coalesced_analysis(endpoint, decoded_image, fields, compute, idempotency_key)
+            return enhanced_body(results, fields, analysis_type), outcome
+        except (IdempotencyConflict, AdmissionRejected):
+            raise
+        except Exception as e:
+            logger.error(f"{analysis_type} analysis failed: {e}")
+            # Fallback to basic analysis
+            pass
+    
+    # Basic analysis fallback
+    return basic_analysis_body(basic_analysis_type), 'computed'
+
+def skin_analysis_options(fields: Optional[FieldTree]) -> Dict:
+    """analyze_skin_conditions arguments that skip work a ``fields`` projection drops
+
+    Only the selected conditions are computed, unless a summary such as
+    ``health_score`` is selected, which needs all of them. Spot lists are built
+    only when a selected condition includes them.
+    """
+    results = select_fields(fields, 'results')
+    if results is True:
+        return {}
+    if results is None:
+        return {'conditions': (), 'include_spots': False}
+    
+    selected = select_fields(results, 'conditions')
+    conditions = None
+    if set(results) == {'conditions'} and selected is not True:
+        conditions = list(selected)
+    include_spots = any(select_fields(results, 'conditions', name, 'spots') is not None
+                        for name in ('acne', 'dark_spots'))
+    return {'conditions': conditions, 'include_spots': include_spots}
+
+def run_production_analysis(img_array: np.ndarray, faces: List[FaceBox],
+                            fields: Optional[FieldTree] = None) -> Tuple[Dict, int]:
+    """Production-model analysis of a decoded image
+
+    Returns the response body, projected to ``fields`` when given, and HTTP
+    status; shared by the synchronous, batch and job endpoints. Raises when the
+    analyzer fails.
+    """
+    if len(faces) == 0:
+        return {
+            'success': False,
+            'error': 'No faces detected',
+            'message': 'Please ensure a clear face is visible in the image'
+        }, 400
+    
+    # Get the largest face
+    x, y, w, h = largest_face(faces)
+    
+    # Calculate face detection confidence
+    face_detection_confidence = 0.95
+    
+    # Enhanced analysis using Hare Run V6
+    if enhanced_analyzer:
+        try:
+            # Spot lists are not part of the production response
+            results = enhanced_analyzer.analyze_skin_conditions(img_array, include_spots=False)
+            
+            # Process the enhanced results and convert to expected format
+            if isinstance(results, dict) and 'conditions' in results:
+                # Convert enhanced analyzer results to detected_conditions format
+                detected_conditions = []
+                
+                # Process each condition type from enhanced analyzer
+                for condition_type, condition_data in results['conditions'].items():
+                    if isinstance(condition_data, dict):
+                        # Extract severity and confidence from enhanced results
+                        severity = condition_data.get('severity', 'none')
+                        confidence = condition_data.get('confidence', 0.5)
+                        
+                        # Create condition object in expected format
+                        detected_conditions.append({
+                            'name': condition_type,
+                            'confidence': float(confidence),
+                            'severity': str(severity),
+                            'source': 'enhanced_analysis',
+                            'description': f'Detected {condition_type} with {severity} severity'
+                        })
+                
+                # If no conditions detected, mark as healthy
+                if not detected_conditions:
+                    detected_conditions = [{
+                        'name': 'healthy',
+                        'confidence': 0.9,
+                        'severity': 'none',
+                        'source': 'enhanced_analysis',
+                        'description': 'No significant skin concerns detected by enhanced analysis'
+                    }]
+                
+                # Get primary condition from enhanced results
+                primary_condition = detected_conditions[0]['name']
+                health_score = results.get('health_score', 85)
+                
+                return project_response({
+                    'success': True,
+                    'analysis_type': 'Enhanced Production Model',
+                    'result': {
+                        'confidence': face_detection_confidence,
+                        'demographics': {
+                            'age_group': 'adult',
+                            'ethnicity': 'mixed',
+                            'gender': 'unspecified'
+                        },
+                        'detected_conditions': detected_conditions,
+                        'primary_condition': primary_condition,
+                        'severity': 1,
+                        'health_score': health_score,
+                        'model_info': {
+                            'version': 'Hare_Run_V6_Facial_v1.0',
+                            'accuracy': '97.13%',
+                            'type': 'Enhanced_Facial_ML'
+                        }
+                    },
+                    'timestamp': datetime.now().isoformat()
+                }, fields), 200
+            else:
+                # Enhanced analyzer returned unexpected format
+                raise ValueError(f"Enhanced analyzer returned unexpected format: {type(results)}")
+            
+        except Exception as e:
+            logger.error(f"Enhanced analysis failed: {e}")
+            # Don't fallback - fail properly
+            raise Exception(f"Enhanced skin analysis failed: {e}")
+    
+    # If no enhanced analyzer available, fail
+    raise Exception("Enhanced skin analyzer not available")
+
+@oversized_body_as_request_error
+def batch_image_loaders(req) -> List[Callable[[], Tuple[DecodedImage, Optional[List[FaceBox]]]]]:
+    """One deferred loader per image in a batch request, in upload order"""
+    loaders = []
+    if req.is_json:
+        data = req.get_json(silent=True)
+        if not isinstance(data, dict):
+            raise ImageRequestError('Invalid JSON body')
+        for image_data in data.get('images') or []:
+            loaders.append(lambda image_data=image_data: (decode_data_url(str(image_data)), None))
+        for image_token in data.get('image_tokens') or []:
+            loaders.append(lambda image_token=image_token: load_image_session(str(image_token)))
+    elif req.mimetype == 'multipart/form-data':
+        # Copy each part out of the request so workers do not depend on the request lifetime
+        uploads = req.files.getlist('images') or list(req.files.values())
+        for upload in uploads:
+            buffer = bytes(read_stream(upload.stream, upload.content_length))
+            loaders.append(lambda buffer=buffer: (decode_image_buffer(buffer), None))
+    else:
+        raise ImageRequestError('Content-Type must be application/json or multipart/form-data')
+    
+    if not loaders:
+        raise ImageRequestError('At least one image is required')
+    if len(loaders) > MAX_BATCH_IMAGES:
+        raise ImageRequestError(f'At most {MAX_BATCH_IMAGES} images may be analyzed per batch', 413)
+    return loaders
+
+def analyze_batch_item(loader: Callable, fields: Optional[FieldTree] = None,
+                       hold: Callable = analysis_admission.hold) -> Tuple[Dict, int]:
+    """Decode, detect and analyze one batch image; errors are reported per image
+
+    Detection and analysis run while holding an analysis slot from ``hold``.
+    """
+    try:
+        decoded_image, faces = loader()
+        with hold():
+            if faces is None:
+                faces = detect_faces(decoded_image.array)
+            return run_production_analysis(decoded_image.array, faces, fields)
+    except ImageRequestError as e:
+        return {'success': False, 'error': str(e)}, e.status_code
+    except Exception as e:
+        logger.error(f"Batch item analysis failed: {e}")
+        return {'success': False, 'error': str(e), 'message': 'Skin analysis failed'}, 500
+
+def run_held(hold: Callable, fn: Callable, *args):
+    """``fn(*args)`` run while holding an analysis slot from ``hold``, for queued jobs"""
+    with hold():
+        return fn(*args)
+
+def readiness() -> Tuple[Dict, int]:
+    """Readiness body and status: ready once models are present and warm-up has finished
+
+    Not ready while any required component failed to initialize; the body
+    names the failed ones.
+    """
+    startup_status = service_startup.status()
+    failed = [name for name in startup_status['failed'] if name in REQUIRED_COMPONENTS]
+    if failed:
+        status, message = 'failed', f"Failed to initialize {', '.join(failed)}"
+    elif not startup_status['ready']:
+        status, message = 'starting', 'Service is starting'
+    elif not hare_run_v6_manager.models_loaded:
+        status, message = 'unavailable', 'ML models not available'
+    else:
+        status, message = 'ready', 'Service is ready'
+    return {
+        "message": message,
+        "service": SERVICE_NAME,
+        "status": status,
+        "models_loaded": hare_run_v6_manager.models_loaded,
+        "failed_components": failed,
+        "warmup": warmup_report,
+        "startup": startup_status,
+        "timestamp": datetime.now().isoformat()
+    }, 200 if status == 'ready' else 503
+
 # ============================================================================
 # HEALTH & STATUS ENDPOINTS
 # ============================================================================
@@ -257,6 +779,10 @@ def api_health():
             "service": SERVICE_NAME,
             "status": "healthy",
             "models_loaded": hare_run_v6_manager.models_loaded,
+            "startup": service_startup.status(),
+            "analysis_jobs": analysis_jobs.stats(),
+            "admission": analysis_admission.stats(),
+            "coalescing": analysis_coalescer.stats(),
             "timestamp": datetime.now().isoformat()
         })
     except Exception as e:
@@ -271,13 +797,9 @@ def api_health():
 
 @app.route('/ready')
 def ready():
-    """Readiness check"""
-    return jsonify({
-        "message": "Service is ready",
-        "service": SERVICE_NAME,
-        "status": "ready",
-        "timestamp": datetime.now().isoformat()
-    })
+    """Readiness check - 503 until models are loaded and warm-up has run"""
+    body, status = readiness()
+    return jsonify(body), status
 
 # ============================================================================
 # FACE DETECTION ENDPOINTS
@@ -287,54 +809,13 @@ def ready():
 def face_detect():
     """Face detection endpoint"""
     try:
-        if not request.is_json:
-            return jsonify({'error': 'Content-Type must be application/json'}), 400
-        
-        data = request.get_json()
-        image_data = data.get('image') or data.get('image_data')
-        
-        if not image_data:
-            return jsonify({'error': 'Image data is required'}), 400
-        
-        # Decode base64 image
-        image_bytes = base64.b64decode(image_data.split(',')[1] if ',' in image_data else image_data)
-        
-        # Process image
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img_array = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if img_array is None:
-            return jsonify({'error': 'Invalid image data'}), 400
-        
-        # Face detection using OpenCV
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        gray = cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+        # Decode the uploaded image (JSON data URL, multipart or raw image body)
+        try:
+            decoded_image = read_request_image(request)
+        except ImageRequestError as e:
+            return jsonify({'error': str(e)}), e.status_code
+        return jsonify(face_detection_body(decoded_image))
         
-        if len(faces) > 0:
-            # Get the largest face
-            largest_face = max(faces, key=lambda x: x[2] * x[3])
-            x, y, w, h = largest_face
-            
-            return jsonify({
-                'success': True,
-                'faces_detected': len(faces),
-                'primary_face': {
-                    'x': int(x),
-                    'y': int(y),
-                    'width': int(w),
-                    'height': int(h),
-                    'confidence': 0.95
-                },
-                'message': f'Detected {len(faces)} face(s)'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'faces_detected': 0,
-                'message': 'No faces detected in the image'
-            })
-            
     except Exception as e:
         logger.error(f"Face detection error: {e}")
         return jsonify({
@@ -347,55 +828,13 @@ def face_detect():
 def face_detect_v4():
     """Face detection endpoint V4 - matches frontend expectations"""
     try:
-        if not request.is_json:
-            return jsonify({'error': 'Content-Type must be application/json'}), 400
-        
-        data = request.get_json()
-        image_data = data.get('image') or data.get('image_data')
-        
-        if not image_data:
-            return jsonify({'error': 'Image data is required'}), 400
-        
-        # Decode base64 image
-        image_bytes = base64.b64decode(image_data.split(',')[1] if ',' in image_data else image_data)
-        
-        # Process image
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img_array = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if img_array is None:
-            return jsonify({'error': 'Invalid image data'}), 400
-        
-        # Face detection using OpenCV
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        gray = cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+        # Decode the uploaded image (JSON data URL, multipart or raw image body)
+        try:
+            decoded_image = read_request_image(request)
+        except ImageRequestError as e:
+            return jsonify({'error': str(e)}), e.status_code
+        return jsonify(face_detection_body(decoded_image, faces_list=True))
         
-        if len(faces) > 0:
-            # Get the largest face
-            largest_face = max(faces, key=lambda x: x[2] * x[3])
-            x, y, w, h = largest_face
-            
-            return jsonify({
-                'success': True,
-                'faces': [{
-                    'x': int(x),
-                    'y': int(y),
-                    'width': int(w),
-                    'height': int(h),
-                    'confidence': 0.95
-                }],
-                'faces_detected': len(faces),
-                'message': f'Detected {len(faces)} face(s)'
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'faces': [],
-                'faces_detected': 0,
-                'message': 'No faces detected in the image'
-            })
-            
     except Exception as e:
         logger.error(f"Face detection V4 error: {e}")
         return jsonify({
@@ -409,18 +848,10 @@ def face_detect_v4():
 # ============================================================================
 
 @app.route('/api/v6/skin/analyze-production-model', methods=['POST'])
+@service_startup.requires(*ANALYSIS_COMPONENTS)
 def analyze_skin_production_model():
     """Production model skin analysis endpoint - matches frontend expectations"""
     try:
-        if not request.is_json:
-            return jsonify({'error': 'Content-Type must be application/json'}), 400
-        
-        data = request.get_json()
-        image_data = data.get('image') or data.get('image_data')
-        
-        if not image_data:
-            return jsonify({'error': 'Image data is required'}), 400
-        
         # Check if models are available
         if not hare_run_v6_manager.is_model_available('facial'):
             return jsonify({
@@ -428,130 +859,140 @@ def analyze_skin_production_model():
                 'message': 'Please try again later'
             }), 503
         
-        # Decode base64 image
-        image_bytes = base64.b64decode(image_data.split(',')[1] if ',' in image_data else image_data)
-        
-        # Process image
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img_array = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if img_array is None:
-            return jsonify({'error': 'Invalid image data'}), 400
+        # Reuse an image session from face detection, or decode the uploaded image
+        try:
+            decoded_image, faces = load_analysis_image(request)
+            fields = requested_fields()
+        except (ImageRequestError, InvalidFields) as e:
+            return jsonify({'error': str(e)}), e.status_code
         
-        # Face detection using OpenCV
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        gray = cv2.cvtColor(img_array, cv2.COLOR_BGR2GRAY)
-        faces = face_cascade.detectMultiScale(gray, 1.1, 4)
+        # The analysis slot is taken inside, once the upload is decoded, and only
+        # by a request that is not sharing or replaying another's result
+        body, status, outcome = production_analysis(decoded_image, faces, fields,
+                                                    request.headers.get('Idempotency-Key'))
+        return coalesced_response(body, status, outcome)
         
-        if len(faces) == 0:
+    except IdempotencyConflict as e:
+        return jsonify({'error': str(e)}), e.status_code
+    except AdmissionRejected:
+        # Rendered by the error handler below
+        raise
+    except Exception as e:
+        logger.error(f"Production model analysis error: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'Skin analysis failed'
+        }), 500
+
+@app.route('/api/v6/skin/analyze-batch', methods=['POST'])
+@service_startup.requires(*ANALYSIS_COMPONENTS)
+def analyze_skin_batch():
+    """Production-model analysis of many images in one request
+    
+    Accepts multipart/form-data with one or more ``images`` file parts, or JSON
+    with an ``images`` list of base64 data URLs and/or an ``image_tokens`` list.
+    Images are decoded, face-detected and analyzed in parallel. Results are
+    returned in upload order, or with ``stream=true`` written as NDJSON lines as
+    each image finishes.
+    """
+    try:
+        # Check if models are available
+        if not hare_run_v6_manager.is_model_available('facial'):
             return jsonify({
-                'success': False,
-                'error': 'No faces detected',
-                'message': 'Please ensure a clear face is visible in the image'
-            }), 400
+                'error': 'ML models not available',
+                'message': 'Please try again later'
+            }), 503
         
-        # Get the largest face
-        largest_face = max(faces, key=lambda x: x[2] * x[3])
-        x, y, w, h = largest_face
+        try:
+            loaders = batch_image_loaders(request)
+            # A fields projection applies to each image's result
+            fields = requested_fields()
+        except (ImageRequestError, InvalidFields) as e:
+            return jsonify({'error': str(e)}), e.status_code
         
-        # Calculate face detection confidence
-        face_detection_confidence = 0.95
+        # Each image holds its own analysis slot while it is analyzed, so a batch
+        # counts against the concurrency limit once per image in progress
+        futures = {batch_executor.submit(analyze_batch_item, loader, fields, analysis_admission.hold): index
+                   for index, loader in enumerate(loaders)}
         
-        # Enhanced analysis using Hare Run V6
-        if enhanced_analyzer:
-            try:
-                results = enhanced_analyzer.analyze_skin_conditions(img_array)
-                
-                # Process the enhanced results and convert to expected format
-                if isinstance(results, dict) and 'conditions' in results:
-                    # Convert enhanced analyzer results to detected_conditions format
-                    detected_conditions = []
-                    
-                    # Process each condition type from enhanced analyzer
-                    for condition_type, condition_data in results['conditions'].items():
-                        if isinstance(condition_data, dict):
-                            # Extract severity and confidence from enhanced results
-                            severity = condition_data.get('severity', 'none')
-                            confidence = condition_data.get('confidence', 0.5)
-                            
-                            # Create condition object in expected format
-                            detected_conditions.append({
-                                'name': condition_type,
-                                'confidence': float(confidence),
-                                'severity': str(severity),
-                                'source': 'enhanced_analysis',
-                                'description': f'Detected {condition_type} with {severity} severity'
-                            })
-                    
-                    # If no conditions detected, mark as healthy
-                    if not detected_conditions:
-                        detected_conditions = [{
-                            'name': 'healthy',
-                            'confidence': 0.9,
-                            'severity': 'none',
-                            'source': 'enhanced_analysis',
-                            'description': 'No significant skin concerns detected by enhanced analysis'
-                        }]
-                    
-                    # Get primary condition from enhanced results
-                    primary_condition = detected_conditions[0]['name']
-                    health_score = results.get('health_score', 85)
-                    
-                    return jsonify({
-                        'success': True,
-                        'analysis_type': 'Enhanced Production Model',
-                        'result': {
-                            'confidence': face_detection_confidence,
-                            'demographics': {
-                                'age_group': 'adult',
-                                'ethnicity': 'mixed',
-                                'gender': 'unspecified'
-                            },
-                            'detected_conditions': detected_conditions,
-                            'primary_condition': primary_condition,
-                            'severity': 1,
-                            'health_score': health_score,
-                            'model_info': {
-                                'version': 'Hare_Run_V6_Facial_v1.0',
-                                'accuracy': '97.13%',
-                                'type': 'Enhanced_Facial_ML'
-                            }
-                        },
-                        'timestamp': datetime.now().isoformat()
-                    })
-                else:
-                    # Enhanced analyzer returned unexpected format
-                    raise ValueError(f"Enhanced analyzer returned unexpected format: {type(results)}")
-                
-            except Exception as e:
-                logger.error(f"Enhanced analysis failed: {e}")
-                # Don't fallback - fail properly
-                raise Exception(f"Enhanced skin analysis failed: {e}")
+        if str(get_request_field(request, 'stream', '')).lower() in ('1', 'true', 'yes'):
+            def stream():
+                for future in as_completed(futures):
+                    body, status = future.result()
+                    yield app.json.dumps(dict(body, index=futures[future], status=status)) + '\n'
+            return Response(stream_with_context(stream()), mimetype='application/x-ndjson')
         
-        # If no enhanced analyzer available, fail
-        raise Exception("Enhanced skin analyzer not available")
+        results = [None] * len(loaders)
+        for future in as_completed(futures):
+            body, status = future.result()
+            results[futures[future]] = dict(body, index=futures[future], status=status)
+        
+        return jsonify({
+            'success': True,
+            'count': len(results),
+            'succeeded': sum(1 for result in results if result['status'] == 200),
+            'results': results,
+            'timestamp': datetime.now().isoformat()
+        })
         
     except Exception as e:
-        logger.error(f"Production model analysis error: {e}")
+        logger.error(f"Batch analysis error: {e}")
         return jsonify({
             'success': False,
             'error': str(e),
-            'message': 'Skin analysis failed'
+            'message': 'Batch skin analysis failed'
         }), 500
 
 @app.route('/api/v6/skin/analyze-hare-run', methods=['POST'])
+@service_startup.requires(*ANALYSIS_COMPONENTS)
 def analyze_skin_hare_run():
     """Hare Run V6 enhanced skin analysis endpoint"""
     try:
-        if not request.is_json:
-            return jsonify({'error': 'Content-Type must be application/json'}), 400
+        # Check if models are available
+        if not hare_run_v6_manager.is_model_available('facial'):
+            return jsonify({
+                'error': 'ML models not available',
+                'message': 'Please try again later'
+            }), 503
         
-        data = request.get_json()
-        image_data = data.get('image') or data.get('image_data')
+        # Reuse an image session from face detection, or decode the uploaded image
+        try:
+            decoded_image, _ = load_analysis_image(request)
+            fields = requested_fields()
+        except (ImageRequestError, InvalidFields) as e:
+            return jsonify({'error': str(e)}), e.status_code
         
-        if not image_data:
-            return jsonify({'error': 'Image data is required'}), 400
+        # The analysis slot is taken inside, once the upload is decoded, and only
+        # by a request that is not sharing or replaying another's result
+        try:
+            body, outcome = enhanced_analysis(decoded_image, fields, 'analyze-hare-run',
+                                              'Hare Run V6 Enhanced', 'Basic Analysis',
+                                              request.headers.get('Idempotency-Key'))
+        except IdempotencyConflict as e:
+            return jsonify({'error': str(e)}), e.status_code
+        return coalesced_response(body, 200, outcome)
         
+    except AdmissionRejected:
+        # Rendered by the error handler below
+        raise
+    except Exception as e:
+        logger.error(f"Skin analysis error: {e}")
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'message': 'Skin analysis failed'
+        }), 500
+
+# ============================================================================
+# ANALYSIS JOB ENDPOINTS
+# ============================================================================
+
+@app.route('/api/v6/skin/jobs', methods=['POST'])
+@service_startup.requires(*ANALYSIS_COMPONENTS)
+def create_analysis_job():
+    """Queue a production-model analysis and return a job id immediately"""
+    try:
         # Check if models are available
         if not hare_run_v6_manager.is_model_available('facial'):
             return jsonify({
@@ -559,70 +1000,89 @@ def analyze_skin_hare_run():
                 'message': 'Please try again later'
             }), 503
         
-        # Decode base64 image
-        image_bytes = base64.b64decode(image_data.split(',')[1] if ',' in image_data else image_data)
-        
-        # Process image
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img_array = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Decode in the request thread so invalid uploads fail fast
+        try:
+            decoded_image, faces = load_analysis_image(request)
+            fields = requested_fields()
+        except (ImageRequestError, InvalidFields) as e:
+            return jsonify({'error': str(e)}), e.status_code
         
-        if img_array is None:
-            return jsonify({'error': 'Invalid image data'}), 400
+        if faces is None:
+            faces = detect_faces(decoded_image.array)
         
-        # Enhanced analysis using Hare Run V6
-        if enhanced_analyzer:
-            try:
-                results = enhanced_analyzer.analyze_skin_conditions(img_array)
-                return jsonify({
-                    'success': True,
-                    'analysis_type': 'Hare Run V6 Enhanced',
-                    'results': results,
-                    'model_info': hare_run_v6_manager.get_model_status(),
-                    'timestamp': datetime.now().isoformat()
-                })
-            except Exception as e:
-                logger.error(f"Enhanced analysis failed: {e}")
-                # Fallback to basic analysis
-                pass
+        try:
+            job = analysis_jobs.submit(run_held, analysis_admission.hold, run_production_analysis,
+                                       decoded_image.array, faces, fields)
+        except JobQueueFull as e:
+            response = jsonify({
+                'success': False,
+                'error': str(e),
+                'message': 'Too many analyses in progress, please retry shortly'
+            })
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response, 503
         
-        # Basic analysis fallback
         return jsonify({
             'success': True,
-            'analysis_type': 'Basic Analysis',
-            'message': 'Enhanced analysis unavailable, using basic analysis',
-            'basic_results': {
-                'image_processed': True,
-                'face_detected': True,
-                'analysis_available': False
-            },
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': f'/api/v6/skin/jobs/{job.id}',
+            'events_url': f'/api/v6/skin/jobs/{job.id}/events',
             'timestamp': datetime.now().isoformat()
-        })
+        }), 202
         
     except Exception as e:
-        logger.error(f"Skin analysis error: {e}")
+        logger.error(f"Analysis job submission error: {e}")
         return jsonify({
             'success': False,
             'error': str(e),
-            'message': 'Skin analysis failed'
+            'message': 'Failed to queue skin analysis'
         }), 500
 
+@app.route('/api/v6/skin/jobs/<job_id>')
+def get_analysis_job(job_id):
+    """Status of an analysis job, with the analysis response once finished"""
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/v6/skin/jobs/<job_id>/events')
+def analysis_job_events(job_id):
+    """Server-sent events stream that pushes status changes and the final result"""
+    job = analysis_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    
+    def stream():
+        last_status = None
+        last_event = time.monotonic()
+        while True:
+            if job.status != last_status and not job.done:
+                last_status = job.status
+                last_event = time.monotonic()
+                yield f"event: status\ndata: {app.json.dumps({'job_id': job.id, 'status': job.status})}\n\n"
+            if job.wait(1.0):
+                yield f"event: complete\ndata: {app.json.dumps(job.to_dict())}\n\n"
+                return
+            if time.monotonic() - last_event >= SSE_KEEPALIVE_SECONDS:
+                last_event = time.monotonic()
+                yield ": keep-alive\n\n"
+    
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 # ============================================================================
 # MODEL STATUS ENDPOINTS
 # ============================================================================
 
 @app.route('/api/v4/skin/analyze-enhanced', methods=['POST'])
+@service_startup.requires(*ANALYSIS_COMPONENTS)
 def skin_analyze_enhanced_v4():
     """Enhanced skin analysis endpoint V4 - matches frontend expectations"""
     try:
-        if not request.is_json:
-            return jsonify({'error': 'Content-Type must be application/json'}), 400
-        
-        data = request.get_json()
-        image_data = data.get('image') or data.get('image_data')
-        
-        if not image_data:
-            return jsonify({'error': 'Image data is required'}), 400
-        
         # Check if models are available
         if not hare_run_v6_manager.is_model_available('facial'):
             return jsonify({
@@ -630,45 +1090,26 @@ def skin_analyze_enhanced_v4():
                 'message': 'Please try again later'
             }), 503
         
-        # Decode base64 image
-        image_bytes = base64.b64decode(image_data.split(',')[1] if ',' in image_data else image_data)
-        
-        # Process image
-        nparr = np.frombuffer(image_bytes, np.uint8)
-        img_array = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if img_array is None:
-            return jsonify({'error': 'Invalid image data'}), 400
-        
-        # Enhanced analysis using Hare Run V6
-        if enhanced_analyzer:
-            try:
-                results = enhanced_analyzer.analyze_skin_conditions(img_array)
-                return jsonify({
-                    'success': True,
-                    'analysis_type': 'Enhanced Analysis V4',
-                    'results': results,
-                    'model_info': hare_run_v6_manager.get_model_status(),
-                    'timestamp': datetime.now().isoformat()
-                })
-            except Exception as e:
-                logger.error(f"Enhanced analysis V4 failed: {e}")
-                # Fallback to basic analysis
-                pass
+        # Reuse an image session from face detection, or decode the uploaded image
+        try:
+            decoded_image, _ = load_analysis_image(request)
+            fields = requested_fields()
+        except (ImageRequestError, InvalidFields) as e:
+            return jsonify({'error': str(e)}), e.status_code
         
-        # Basic analysis fallback
-        return jsonify({
-            'success': True,
-            'analysis_type': 'Basic Analysis V4',
-            'message': 'Enhanced analysis unavailable, using basic analysis',
-            'basic_results': {
-                'image_processed': True,
-                'face_detected': True,
-                'analysis_available': False
-            },
-            'timestamp': datetime.now().isoformat()
-        })
+        # The analysis slot is taken inside, once the upload is decoded, and only
+        # by a request that is not sharing or replaying another's result
+        try:
+            body, outcome = enhanced_analysis(decoded_image, fields, 'analyze-enhanced',
+                                              'Enhanced Analysis V4', 'Basic Analysis V4',
+                                              request.headers.get('Idempotency-Key'))
+        except IdempotencyConflict as e:
+            return jsonify({'error': str(e)}), e.status_code
+        return coalesced_response(body, 200, outcome)
         
+    except AdmissionRejected:
+        # Rendered by the error handler below
+        raise
     except Exception as e:
         logger.error(f"Skin analysis V4 error: {e}")
         return jsonify({
@@ -704,6 +1145,32 @@ def model_status():
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
 
+@app.errorhandler(413)
+def request_too_large(error):
+    return jsonify({'error': f'Request body too large; the limit is {MAX_REQUEST_BYTES} bytes'}), 413
+
+@app.errorhandler(AdmissionRejected)
+def admission_rejected(error):
+    response = jsonify({
+        'success': False,
+        'error': str(error),
+        'message': 'Too many analyses in progress, please retry shortly',
+        'queue_depth': error.queue_depth
+    })
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, error.status_code
+
+@app.errorhandler(StartupInProgress)
+def startup_in_progress(error):
+    response = jsonify({
+        'success': False,
+        'error': str(error),
+        'message': 'Service is starting, please retry shortly',
+        'startup': error.status
+    })
+    response.headers['Retry-After'] = str(error.retry_after)
+    return response, error.status_code
+
 @app.errorhandler(500)
 def internal_error(error):
     return jsonify({'error': 'Internal server error'}), 500
@@ -717,17 +1184,9 @@ if __name__ == "__main__":
     logger.info(f"S3 Bucket: {S3_BUCKET}")
     logger.info(f"Model Key: {S3_MODEL_KEY}")
     
-    # Force model loading before starting Flask
+    # Models load in the background; analysis routes answer 503 until they are ready
+    service_startup.start()
     try:
-        logger.info("🔄 Loading production models...")
-        hare_run_v6_manager._ensure_models_loaded()
-        
-        if hare_run_v6_manager.models_loaded:
-            logger.info("✅ Models loaded successfully!")
-            logger.info(f"📊 Model info: {hare_run_v6_manager.get_model_status()}")
-        else:
-            logger.warning("⚠️ No models loaded - some features may not work")
-        
         logger.info("🌐 Starting Flask server...")
         app.run(host='0.0.0.0', port=PORT, debug=False)
         
@@ -6,21 +6,26 @@ Comprehensive computer vision and ML algorithms for skin analysis
 
 import numpy as np
 import cv2
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, Iterable, List, Tuple, Optional
 import logging
-from skimage import feature, filters, morphology, measure
-from scipy import ndimage, stats
-import colorsys
+
+from face_detection import (
+    face_detector_pool, resize_image, EYE_CASCADE, FACE_DETECTION_CONFIG, ANALYSIS_DETECTION_PARAMS
+)
 
 logger = logging.getLogger(__name__)
 
+# Conditions reported by analyze_skin_conditions, in response order
+CONDITION_NAMES = ('acne', 'redness', 'dark_spots', 'texture', 'pores', 'wrinkles', 'pigmentation')
+
 class EnhancedSkinAnalyzer:
     """Advanced skin analysis using computer vision and ML techniques"""
     
     def __init__(self):
         """Initialize the enhanced skin analyzer"""
-        self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+        # Cascades come from the shared pool, which gives each thread its own instance
+        self.detector_pool = face_detector_pool
+        self.detector_pool.preload()
         
         # Analysis parameters
         self.analysis_params = {
@@ -57,12 +62,7 @@ class EnhancedSkinAnalyzer:
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
             # Multi-scale face detection
-            faces = self.face_cascade.detectMultiScale(
-                gray, 
-                scaleFactor=1.1, 
-                minNeighbors=5,
-                minSize=(30, 30)
-            )
+            faces = self.detector_pool.detect_faces(image, **ANALYSIS_DETECTION_PARAMS)
             
             if len(faces) == 0:
                 return {
@@ -80,8 +80,10 @@ class EnhancedSkinAnalyzer:
             face_roi = image[y:y+h, x:x+w]
             face_gray = gray[y:y+h, x:x+w]
             
-            # Eye detection within face
-            eyes = self.eye_cascade.detectMultiScale(face_gray)
+            # Eye detection within the upper half of the face, at working resolution
+            eye_region = face_gray[:max(1, h // 2), :]
+            eye_scale = min(1.0, FACE_DETECTION_CONFIG['working_max_dimension'] / float(max(eye_region.shape)))
+            eyes = self.detector_pool.detect(resize_image(eye_region, eye_scale), EYE_CASCADE, scaleFactor=1.1, minNeighbors=3)
             
             # Calculate face quality metrics
             quality_metrics = self._calculate_face_quality(face_roi, face_gray, len(eyes))
@@ -113,26 +115,34 @@ class EnhancedSkinAnalyzer:
                 'error': str(e)
             }
     
-    def analyze_skin_conditions(self, image: np.ndarray, face_roi: Optional[np.ndarray] = None) -> Dict:
-        """Comprehensive skin condition analysis"""
+    def analyze_skin_conditions(self, image: np.ndarray, face_roi: Optional[np.ndarray] = None,
+                                conditions: Optional[Iterable[str]] = None, include_spots: bool = True) -> Dict:
+        """Comprehensive skin condition analysis
+        
+        ``conditions`` limits which analyses run (all by default). With
+        ``include_spots=False`` the per-spot lists for acne and dark spots are not
+        built; counts and percentages are always computed.
+        """
         try:
             # Use face ROI if provided, otherwise use full image
             analysis_image = face_roi if face_roi is not None else image
+            selected = set(conditions) if conditions is not None else set(CONDITION_NAMES)
             
-            # Convert to different color spaces
-            hsv = cv2.cvtColor(analysis_image, cv2.COLOR_BGR2HSV)
-            lab = cv2.cvtColor(analysis_image, cv2.COLOR_BGR2LAB)
+            # Convert to the color spaces the selected analyses need
+            hsv = cv2.cvtColor(analysis_image, cv2.COLOR_BGR2HSV) if selected & {'acne', 'redness'} else None
+            lab = cv2.cvtColor(analysis_image, cv2.COLOR_BGR2LAB) if selected & {'dark_spots', 'pigmentation'} else None
             
             # Analyze different skin conditions
-            conditions = {
-                'acne': self._analyze_acne(analysis_image, hsv),
-                'redness': self._analyze_redness(hsv),
-                'dark_spots': self._analyze_dark_spots(lab),
-                'texture': self._analyze_texture(analysis_image),
-                'pores': self._analyze_pores(analysis_image),
-                'wrinkles': self._analyze_wrinkles(analysis_image),
-                'pigmentation': self._analyze_pigmentation(lab)
+            analyses = {
+                'acne': lambda: self._analyze_acne(analysis_image, hsv, include_spots),
+                'redness': lambda: self._analyze_redness(hsv),
+                'dark_spots': lambda: self._analyze_dark_spots(lab, include_spots),
+                'texture': lambda: self._analyze_texture(analysis_image),
+                'pores': lambda: self._analyze_pores(analysis_image),
+                'wrinkles': lambda: self._analyze_wrinkles(analysis_image),
+                'pigmentation': lambda: self._analyze_pigmentation(lab)
             }
+            conditions = {name: analyses[name]() for name in CONDITION_NAMES if name in selected}
             
             # Calculate overall health score
             health_score = self._calculate_overall_health_score(conditions)
@@ -152,7 +162,7 @@ class EnhancedSkinAnalyzer:
                 'error': str(e)
             }
     
-    def _analyze_acne(self, image: np.ndarray, hsv: np.ndarray) -> Dict:
+    def _analyze_acne(self, image: np.ndarray, hsv: np.ndarray, include_spots: bool = True) -> Dict:
         """Advanced acne detection using multiple algorithms"""
         try:
             # Red channel analysis for inflammation
@@ -181,29 +191,14 @@ class EnhancedSkinAnalyzer:
             # Find connected components
             num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(acne_mask)
             
-            # Analyze each component
-            acne_spots = []
-            total_acne_area = 0
-            
-            for i in range(1, num_labels):  # Skip background
-                area = stats[i, cv2.CC_STAT_AREA]
-                if area > 5:  # Reduced minimum size threshold from 10 to 5
-                    acne_spots.append({
-                        'area': int(area),
-                        'centroid': (int(centroids[i][0]), int(centroids[i][1])),
-                        'bounding_box': (
-                            int(stats[i, cv2.CC_STAT_LEFT]),
-                            int(stats[i, cv2.CC_STAT_TOP]),
-                            int(stats[i, cv2.CC_STAT_WIDTH]),
-                            int(stats[i, cv2.CC_STAT_HEIGHT])
-                        )
-                    })
-                    total_acne_area += int(area)
+            # Analyze each component (skip background); spot details only when requested
+            spot_labels = np.flatnonzero(stats[1:, cv2.CC_STAT_AREA] > 5) + 1  # Reduced minimum size threshold from 10 to 5
+            total_acne_area = int(stats[spot_labels, cv2.CC_STAT_AREA].sum())
+            spot_count = int(spot_labels.size)
             
             # Calculate metrics - convert to Python types
             total_pixels = int(acne_mask.size)
             acne_percentage = float(total_acne_area) / float(total_pixels)
-            spot_count = len(acne_spots)
             
             # Determine severity - extremely conservative thresholds for healthy skin
             severity = 'none'
@@ -214,19 +209,37 @@ class EnhancedSkinAnalyzer:
             elif acne_percentage > 0.08 or spot_count > 10:  # High threshold for mild
                 severity = 'mild'
             
-            return {
+            result = {
                 'detected': acne_percentage > 0.08,  # Extremely high detection threshold
                 'percentage': float(acne_percentage),
                 'spot_count': spot_count,
                 'severity': severity,
-                'confidence': min(1.0, acne_percentage * 20 + spot_count * 0.1),  # Much reduced multipliers for very conservative scoring
-                'spots': acne_spots
+                'confidence': min(1.0, acne_percentage * 20 + spot_count * 0.1)  # Much reduced multipliers for very conservative scoring
             }
+            if include_spots:
+                result['spots'] = self._describe_spots(stats, centroids, spot_labels)
+            return result
             
         except Exception as e:
             logger.error(f"❌ Acne analysis failed: {e}")
             return {'detected': False, 'percentage': 0.0, 'severity': 'none', 'confidence': 0.0}
     
+    def _describe_spots(self, stats: np.ndarray, centroids: np.ndarray, labels: np.ndarray) -> List[Dict]:
+        """Area, centroid and bounding box of each connected component in labels"""
+        return [
+            {
+                'area': int(stats[i, cv2.CC_STAT_AREA]),
+                'centroid': (int(centroids[i][0]), int(centroids[i][1])),
+                'bounding_box': (
+                    int(stats[i, cv2.CC_STAT_LEFT]),
+                    int(stats[i, cv2.CC_STAT_TOP]),
+                    int(stats[i, cv2.CC_STAT_WIDTH]),
+                    int(stats[i, cv2.CC_STAT_HEIGHT])
+                )
+            }
+            for i in labels
+        ]
+    
     def _analyze_redness(self, hsv: np.ndarray) -> Dict:
         """Advanced redness detection using HSV color space"""
         try:
@@ -279,7 +292,7 @@ class EnhancedSkinAnalyzer:
             logger.error(f"❌ Redness analysis failed: {e}")
             return {'detected': False, 'percentage': 0.0, 'severity': 'none', 'confidence': 0.0}
     
-    def _analyze_dark_spots(self, lab: np.ndarray) -> Dict:
+    def _analyze_dark_spots(self, lab: np.ndarray, include_spots: bool = True) -> Dict:
         """Advanced dark spots detection using LAB color space"""
         try:
             # L channel (lightness)
@@ -304,28 +317,13 @@ class EnhancedSkinAnalyzer:
             # Find connected components
             num_labels, labels, stats, centroids = cv2.connectedComponentsWithStats(dark_spots_mask)
             
-            # Analyze spots
-            dark_spots = []
-            total_dark_area = 0
-            
-            for i in range(1, num_labels):
-                area = stats[i, cv2.CC_STAT_AREA]
-                if area > 15:  # Minimum size threshold
-                    dark_spots.append({
-                        'area': int(area),
-                        'centroid': (int(centroids[i][0]), int(centroids[i][1])),
-                        'bounding_box': (
-                            int(stats[i, cv2.CC_STAT_LEFT]),
-                            int(stats[i, cv2.CC_STAT_TOP]),
-                            int(stats[i, cv2.CC_STAT_WIDTH]),
-                            int(stats[i, cv2.CC_STAT_HEIGHT])
-                        )
-                    })
-                    total_dark_area += int(area)
+            # Analyze spots above the minimum size threshold
+            spot_labels = np.flatnonzero(stats[1:, cv2.CC_STAT_AREA] > 15) + 1
+            total_dark_area = int(stats[spot_labels, cv2.CC_STAT_AREA].sum())
             
             # Calculate metrics - convert to Python types
             dark_percentage = float(total_dark_area) / float(dark_spots_mask.size)
-            spot_count = len(dark_spots)
+            spot_count = int(spot_labels.size)
             
             # Determine severity
             severity = 'none'
@@ -336,14 +334,16 @@ class EnhancedSkinAnalyzer:
             elif dark_percentage > 0.01 or spot_count > 0:
                 severity = 'mild'
             
-            return {
+            result = {
                 'detected': dark_percentage > 0.01,
                 'percentage': float(dark_percentage),
                 'spot_count': spot_count,
                 'severity': severity,
-                'confidence': min(1.0, dark_percentage * 15 + spot_count * 0.2),
-                'spots': dark_spots
+                'confidence': min(1.0, dark_percentage * 15 + spot_count * 0.2)
             }
+            if include_spots:
+                result['spots'] = self._describe_spots(stats, centroids, spot_labels)
+            return result
             
         except Exception as e:
             logger.error(f"❌ Dark spots analysis failed: {e}")
@@ -354,8 +354,9 @@ class EnhancedSkinAnalyzer:
         try:
             gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
-            # Local Binary Pattern
-            lbp = feature.local_binary_pattern(gray, 8, 1, method='uniform')
+            # Local Binary Pattern; scikit-image is slow to import, so load it on first texture analysis
+            from skimage.feature import local_binary_pattern
+            lbp = local_binary_pattern(gray, 8, 1, method='uniform')
             lbp_hist, _ = np.histogram(lbp, bins=10, range=(0, 10))
             lbp_hist = lbp_hist.astype(float) / lbp_hist.sum()
             
@@ -0,0 +1,305 @@
+#!/usr/bin/env python3
+"""
+Shared Face Detection
+Process-wide Haar cascade pool with per-thread classifier instances and
+resolution-independent face detection
+"""
+
+import os
+import json
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import cv2
+
+logger = logging.getLogger(__name__)
+
+FACE_CASCADE = 'haarcascade_frontalface_default.xml'
+EYE_CASCADE = 'haarcascade_eye.xml'
+
+# Default detectMultiScale parameters used by the API endpoints
+DEFAULT_DETECTION_PARAMS = {
+    'scaleFactor': 1.1,
+    'minNeighbors': 4
+}
+
+# Parameters used by EnhancedSkinAnalyzer.analyze_face_detection
+ANALYSIS_DETECTION_PARAMS = {
+    'scaleFactor': 1.1,
+    'minNeighbors': 5,
+    'minSize': (30, 30)
+}
+
+# Face detection runs on a downscaled working copy so latency does not grow with camera resolution
+FACE_DETECTION_CONFIG = {
+    'working_max_dimension': 640,   # Longest side of the image the cascade scans
+    'min_face_fraction': 0.1,       # Smallest face, relative to the shorter image side
+    'max_face_fraction': 1.0,       # Largest face, relative to the shorter image side
+    'refine_below_scale': 0.5,      # Re-detect around each candidate when downscaled further than this
+    'refine_margin': 0.25,          # Context added around a candidate box before refining
+    'refine_size_tolerance': 0.3,   # Allowed size change of the refined box
+    'skin_precheck': os.getenv('FACE_SKIN_PRECHECK', 'true').lower() == 'true',
+    'skin_precheck_stride': 4,      # Thumbnail samples every Nth pixel on each axis
+    'skin_min_region_fraction': 0.3  # Skin region needed, relative to the smallest face area
+}
+
+# YCrCb chroma bounds for skin across a wide range of tones
+SKIN_YCRCB_LOWER = np.array([40, 133, 77], dtype=np.uint8)
+SKIN_YCRCB_UPPER = np.array([255, 173, 127], dtype=np.uint8)
+
+# Smallest window the frontal face cascade was trained on
+CASCADE_WINDOW = 24
+
+FaceBox = Tuple[int, int, int, int]
+
+# Tuned settings written by tune_face_detection.py
+FACE_DETECTION_CONFIG_PATH = os.getenv(
+    'FACE_DETECTION_CONFIG_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config', 'face_detection.json')
+)
+
+
+def load_face_detection_config(path: str = FACE_DETECTION_CONFIG_PATH) -> bool:
+    """Apply tuned detection settings from a JSON config, if one exists"""
+    if not os.path.exists(path):
+        return False
+
+    try:
+        with open(path, 'r') as f:
+            tuned = json.load(f)
+
+        DEFAULT_DETECTION_PARAMS.update(tuned.get('detection_params', {}))
+        analysis_params = dict(tuned.get('analysis_detection_params', {}))
+        if 'minSize' in analysis_params:
+            analysis_params['minSize'] = tuple(analysis_params['minSize'])
+        ANALYSIS_DETECTION_PARAMS.update(analysis_params)
+        FACE_DETECTION_CONFIG.update(
+            {k: v for k, v in tuned.get('detection', {}).items() if k in FACE_DETECTION_CONFIG}
+        )
+        logger.info(f"Loaded face detection config from {path}")
+        return True
+
+    except Exception as e:
+        logger.error(f"Failed to load face detection config {path}: {e}")
+        return False
+
+
+class FaceDetectorPool:
+    """Loads each cascade once per process and hands out per-thread classifiers
+
+    cv2.CascadeClassifier keeps mutable scratch state while scanning, so a single
+    instance must not be shared between Flask worker threads. The XML for each
+    cascade is read from disk exactly once; every thread then builds its own
+    classifier from the in-memory copy the first time it needs one.
+    """
+
+    def __init__(self, cascade_dir: Optional[str] = None):
+        self.cascade_dir = cascade_dir or cv2.data.haarcascades
+        self._xml_cache: Dict[str, str] = {}
+        self._xml_lock = threading.Lock()
+        self._local = threading.local()
+
+    def _get_cascade_xml(self, name: str) -> str:
+        """Read cascade XML from disk once per process"""
+        xml = self._xml_cache.get(name)
+        if xml is None:
+            with self._xml_lock:
+                xml = self._xml_cache.get(name)
+                if xml is None:
+                    with open(self.cascade_dir + name, 'r') as f:
+                        xml = f.read()
+                    self._xml_cache[name] = xml
+                    logger.info(f"Loaded cascade {name} into detector pool")
+        return xml
+
+    def get_classifier(self, name: str = FACE_CASCADE) -> cv2.CascadeClassifier:
+        """Return this thread's classifier for the given cascade"""
+        classifiers = getattr(self._local, 'classifiers', None)
+        if classifiers is None:
+            classifiers = self._local.classifiers = {}
+
+        classifier = classifiers.get(name)
+        if classifier is None:
+            storage = cv2.FileStorage(
+                self._get_cascade_xml(name),
+                cv2.FILE_STORAGE_READ | cv2.FILE_STORAGE_MEMORY
+            )
+            classifier = cv2.CascadeClassifier()
+            if not classifier.read(storage.getFirstTopLevelNode()):
+                raise RuntimeError(f"Failed to load cascade {name}")
+            storage.release()
+            classifiers[name] = classifier
+        return classifier
+
+    def preload(self, names: Tuple[str, ...] = (FACE_CASCADE, EYE_CASCADE)):
+        """Read cascade XML up front so the first request does not pay for it"""
+        for name in names:
+            self._get_cascade_xml(name)
+
+    def detect(self, gray: np.ndarray, cascade: str = FACE_CASCADE, **params) -> List[FaceBox]:
+        """Run a cascade on a grayscale image and return plain (x, y, w, h) tuples"""
+        detection_params = dict(DEFAULT_DETECTION_PARAMS)
+        detection_params.update(params)
+        boxes = self.get_classifier(cascade).detectMultiScale(gray, **detection_params)
+        return [(int(x), int(y), int(w), int(h)) for x, y, w, h in boxes]
+
+    def detect_faces(self, image: np.ndarray, **params) -> List[FaceBox]:
+        """Detect faces in a BGR or grayscale image
+
+        Colour images without a skin-coloured region large enough to hold a
+        face are rejected before any cascade runs. The cascade scans a copy
+        whose longest side is at most ``working_max_dimension``, with min/max
+        face sizes relative to the image.
+        A ``minSize``/``maxSize`` passed by the caller is in source pixels. When
+        the working copy is much smaller than the source, each candidate is
+        re-detected in a narrow size band around it. Boxes are returned in
+        source image coordinates.
+        """
+        config = FACE_DETECTION_CONFIG
+        precheck = params.pop('skin_precheck', config['skin_precheck'])
+        if precheck and not has_skin_region(image):
+            return []
+
+        gray = to_grayscale(image)
+        height, width = gray.shape[:2]
+
+        scale = min(1.0, config['working_max_dimension'] / float(max(height, width)))
+        working = resize_image(gray, scale)
+
+        detection_params = dict(params)
+        detection_params['minSize'], detection_params['maxSize'] = self._size_bounds(
+            working.shape[:2], scale, params.get('minSize'), params.get('maxSize')
+        )
+        if detection_params['minSize'][0] > detection_params['maxSize'][0]:
+            return []
+
+        faces = [
+            scale_box(box, 1.0 / scale, width, height)
+            for box in self.detect(working, FACE_CASCADE, **detection_params)
+        ]
+
+        if scale < config['refine_below_scale']:
+            faces = [self._refine_face(gray, box, params) for box in faces]
+        return faces
+
+    def _size_bounds(self, working_shape: Tuple[int, int], scale: float,
+                     min_size: Optional[Tuple[int, int]] = None,
+                     max_size: Optional[Tuple[int, int]] = None) -> Tuple[Tuple[int, int], Tuple[int, int]]:
+        """Face size bounds in working-image pixels"""
+        short_side = min(working_shape)
+
+        lower = max(CASCADE_WINDOW, int(short_side * FACE_DETECTION_CONFIG['min_face_fraction']))
+        if min_size:
+            lower = max(lower, int(min(min_size) * scale))
+
+        upper = int(short_side * FACE_DETECTION_CONFIG['max_face_fraction'])
+        if max_size:
+            upper = min(upper, int(max(max_size) * scale))
+
+        return (lower, lower), (upper, upper)
+
+    def _refine_face(self, gray: np.ndarray, box: FaceBox, params: Dict) -> FaceBox:
+        """Re-detect a coarse candidate in a narrow size band around its source-resolution crop"""
+        config = FACE_DETECTION_CONFIG
+        height, width = gray.shape[:2]
+        x, y, w, h = box
+
+        margin = int(max(w, h) * config['refine_margin'])
+        x0, y0 = max(0, x - margin), max(0, y - margin)
+        x1, y1 = min(width, x + w + margin), min(height, y + h + margin)
+        crop = gray[y0:y1, x0:x1]
+
+        # Refinement only needs enough resolution to place the box precisely
+        crop_scale = min(1.0, config['working_max_dimension'] / float(max(crop.shape[:2])))
+        crop = resize_image(crop, crop_scale)
+
+        tolerance = config['refine_size_tolerance']
+        face_size = max(w, h) * crop_scale
+        lower = max(CASCADE_WINDOW, int(face_size * (1.0 - tolerance)))
+        upper = max(lower, int(face_size * (1.0 + tolerance)))
+
+        refine_params = {k: v for k, v in params.items() if k not in ('minSize', 'maxSize')}
+        candidates = self.detect(crop, FACE_CASCADE, minSize=(lower, lower), maxSize=(upper, upper), **refine_params)
+        if not candidates:
+            return box
+
+        rx, ry, rw, rh = scale_box(largest_face(candidates), 1.0 / crop_scale, x1 - x0, y1 - y0)
+        return (rx + x0, ry + y0, rw, rh)
+
+
+def to_grayscale(image: np.ndarray) -> np.ndarray:
+    """Convert a BGR image to grayscale, passing grayscale input through"""
+    if image.ndim == 2:
+        return image
+    return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+
+def has_skin_region(image: np.ndarray) -> bool:
+    """Cheap check for a skin-coloured region large enough to contain a face
+
+    Works on a strided thumbnail (1/16 of the pixels at the default stride), so
+    screenshots, product photos and black frames are rejected for a fraction of
+    the cost of a cascade scan that finds nothing. Grayscale input cannot be
+    judged by colour and always passes.
+    """
+    if image.ndim != 3 or image.shape[2] != 3:
+        return True
+
+    config = FACE_DETECTION_CONFIG
+    stride = config['skin_precheck_stride']
+    thumbnail = np.ascontiguousarray(image[::stride, ::stride])
+    if thumbnail.size == 0:
+        return False
+
+    ycrcb = cv2.cvtColor(thumbnail, cv2.COLOR_BGR2YCrCb)
+    skin_mask = cv2.inRange(ycrcb, SKIN_YCRCB_LOWER, SKIN_YCRCB_UPPER)
+
+    min_face_side = min(thumbnail.shape[:2]) * config['min_face_fraction']
+    min_region_area = max(1, int(min_face_side * min_face_side * config['skin_min_region_fraction']))
+    if cv2.countNonZero(skin_mask) < min_region_area:
+        return False
+
+    num_labels, _, stats, _ = cv2.connectedComponentsWithStats(skin_mask, connectivity=8)
+    if num_labels <= 1:
+        return False
+    return int(stats[1:, cv2.CC_STAT_AREA].max()) >= min_region_area
+
+
+def resize_image(image: np.ndarray, scale: float) -> np.ndarray:
+    """Downscale an image by the given factor, returning it unchanged at scale 1"""
+    if scale >= 1.0:
+        return image
+    height, width = image.shape[:2]
+    size = (max(1, int(round(width * scale))), max(1, int(round(height * scale))))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def scale_box(box: FaceBox, factor: float, width: int, height: int) -> FaceBox:
+    """Map a box between image resolutions, clipped to the target image"""
+    x, y, w, h = box
+    x0 = min(width - 1, max(0, int(round(x * factor))))
+    y0 = min(height - 1, max(0, int(round(y * factor))))
+    x1 = min(width, int(round((x + w) * factor)))
+    y1 = min(height, int(round((y + h) * factor)))
+    return (x0, y0, max(1, x1 - x0), max(1, y1 - y0))
+
+
+def largest_face(faces: List[FaceBox]) -> Optional[FaceBox]:
+    """Return the face box with the largest area"""
+    if not faces:
+        return None
+    return max(faces, key=lambda box: box[2] * box[3])
+
+
+# Process-wide pool shared by all endpoints and analyzers
+face_detector_pool = FaceDetectorPool()
+
+
+def detect_faces(image: np.ndarray, **params) -> List[FaceBox]:
+    """Detect faces using the shared detector pool"""
+    return face_detector_pool.detect_faces(image, **params)
+
+
+load_face_detection_config()
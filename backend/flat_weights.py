@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Flat Model Weights
+Memory-mappable weight format: a JSON header followed by contiguous, aligned
+arrays. Loading maps the file with np.memmap instead of parsing HDF5 and
+copying onto the heap, so it takes milliseconds and every process on a host
+shares the same weight pages through the page cache.
+
+File layout:
+    8 bytes   magic b'SHINEFW1'
+    8 bytes   header length, little-endian uint64
+    N bytes   UTF-8 JSON header, padded with spaces to the alignment
+    arrays    each at the ``offset`` recorded in the header, aligned to ``alignment``
+
+Usage:
+    python flat_weights.py convert models/comprehensive_model_best.h5
+    python flat_weights.py inspect models/comprehensive_model_best.flat
+"""
+
+import os
+import sys
+import json
+import struct
+import argparse
+import importlib.util
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# h5py is only needed to convert and is imported then; flat files load without it
+H5_CONVERSION_AVAILABLE = importlib.util.find_spec('h5py') is not None
+
+MAGIC = b'SHINEFW1'
+FORMAT_VERSION = 1
+# Cache-line and SIMD friendly; also keeps every array aligned for its dtype
+ALIGNMENT = 64
+FLAT_WEIGHTS_SUFFIX = '.flat'
+
+_PREAMBLE = struct.Struct('<8sQ')
+
+
+class FlatWeightsError(Exception):
+    """Raised for files that are not valid flat weight files"""
+
+
+def _align(offset: int, alignment: int = ALIGNMENT) -> int:
+    return (offset + alignment - 1) // alignment * alignment
+
+
+def flat_weights_path(model_path: str) -> str:
+    """Where the flat weights converted from a model file live"""
+    return os.path.splitext(model_path)[0] + FLAT_WEIGHTS_SUFFIX
+
+
+def write_flat_weights(path: str, tensors: Dict[str, np.ndarray], metadata: Optional[Dict] = None):
+    """Write named arrays to path, publishing the file atomically"""
+    entries = []
+    arrays = []
+    for name, array in tensors.items():
+        # np.ascontiguousarray would turn 0-d arrays into 1-d
+        array = np.array(array, order='C', copy=False)
+        if array.dtype.hasobject:
+            raise FlatWeightsError(f"Tensor {name} has an object dtype and cannot be stored")
+        # Stored little-endian so files are portable between hosts
+        array = array.astype(array.dtype.newbyteorder('<'), copy=False)
+        entries.append({'name': name, 'dtype': array.dtype.str, 'shape': list(array.shape), 'nbytes': array.nbytes})
+        arrays.append(array)
+
+    header = {'format_version': FORMAT_VERSION, 'alignment': ALIGNMENT, 'metadata': metadata or {},
+              'tensors': entries}
+    # Offsets depend on the header size, which depends on the offsets; grow the data start until the header fits
+    data_start = _align(_PREAMBLE.size)
+    while True:
+        offset = data_start
+        for entry in entries:
+            entry['offset'] = offset
+            offset = _align(offset + entry['nbytes'])
+        header_bytes = json.dumps(header, separators=(',', ':')).encode('utf-8')
+        needed = _align(_PREAMBLE.size + len(header_bytes))
+        if needed <= data_start:
+            break
+        data_start = needed
+    header_bytes = header_bytes.ljust(data_start - _PREAMBLE.size, b' ')
+
+    # Per-process temporary name, so concurrent conversions of one model cannot interleave
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(_PREAMBLE.pack(MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        for entry, array in zip(entries, arrays):
+            f.seek(entry['offset'])
+            f.write(array.tobytes())
+        f.truncate(_align(f.tell()))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_header(path: str) -> Dict:
+    with open(path, 'rb') as f:
+        preamble = f.read(_PREAMBLE.size)
+        if len(preamble) != _PREAMBLE.size:
+            raise FlatWeightsError(f"{path} is too short to be a flat weight file")
+        magic, header_length = _PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise FlatWeightsError(f"{path} is not a flat weight file")
+        header = json.loads(f.read(header_length))
+    if header.get('format_version') != FORMAT_VERSION:
+        raise FlatWeightsError(f"{path} has unsupported format version {header.get('format_version')}")
+    return header
+
+
+class FlatWeights:
+    """Read-only mapping of tensor name to an array backed by the mapped file
+
+    Arrays are views into one shared, read-only memory map; nothing is read
+    until a page is touched, and the pages belong to the page cache rather than
+    to any one process.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        header = read_header(path)
+        self.metadata: Dict = header['metadata']
+        self._map = np.memmap(path, dtype=np.uint8, mode='r')
+        self._tensors: Dict[str, np.ndarray] = {}
+        for entry in header['tensors']:
+            end = entry['offset'] + entry['nbytes']
+            if end > self._map.size:
+                raise FlatWeightsError(f"Tensor {entry['name']} extends past the end of {path}")
+            self._tensors[entry['name']] = (
+                self._map[entry['offset']:end].view(np.dtype(entry['dtype'])).reshape(entry['shape'])
+            )
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self._tensors[name]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._tensors
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._tensors)
+
+    def __len__(self) -> int:
+        return len(self._tensors)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self._tensors.values())
+
+    def summary(self) -> Dict:
+        return {'path': self.path, 'tensors': len(self), 'size_mb': round(self.nbytes / (1024 * 1024), 2)}
+
+
+def load_flat_weights(path: str) -> FlatWeights:
+    return FlatWeights(path)
+
+
+# ============================================================================
+# HDF5 CONVERSION
+# ============================================================================
+
+def read_h5_weights(h5_path: str) -> Tuple[Dict[str, np.ndarray], Dict]:
+    """Every dataset of an HDF5 model file, and its JSON-serializable root attributes
+
+    Keras files keep weights under ``model_weights``; when that group exists only
+    it is read, with dataset paths relative to it as tensor names.
+    """
+    try:
+        import h5py
+    except ImportError:
+        raise FlatWeightsError('h5py is required to convert HDF5 models (pip install h5py)')
+
+    tensors: Dict[str, np.ndarray] = {}
+    with h5py.File(h5_path, 'r') as f:
+        root = f['model_weights'] if 'model_weights' in f else f
+
+        def collect(name, node):
+            if isinstance(node, h5py.Dataset):
+                tensors[name] = node[()]
+
+        root.visititems(collect)
+        attributes = {}
+        for key, value in f.attrs.items():
+            if isinstance(value, bytes):
+                value = value.decode('utf-8')
+            elif isinstance(value, np.generic):
+                value = value.item()
+            elif isinstance(value, np.ndarray):
+                value = value.tolist()
+            attributes[key] = value if isinstance(value, (str, int, float, bool, list)) else str(value)
+    return tensors, attributes
+
+
+def convert_h5(h5_path: str, out_path: Optional[str] = None) -> str:
+    """Convert an HDF5 model file to flat weights and return the output path"""
+    out_path = out_path or flat_weights_path(h5_path)
+    tensors, attributes = read_h5_weights(h5_path)
+    stat = os.stat(h5_path)
+    write_flat_weights(out_path, tensors, {
+        'source': os.path.basename(h5_path),
+        'source_size': stat.st_size,
+        'source_mtime_ns': stat.st_mtime_ns,
+        'h5_attributes': attributes
+    })
+    return out_path
+
+
+def is_converted_from(flat_path: str, h5_path: str) -> bool:
+    """Whether flat_path exists and was converted from the current h5_path"""
+    try:
+        metadata = read_header(flat_path)['metadata']
+        stat = os.stat(h5_path)
+    except (OSError, ValueError, FlatWeightsError):
+        return False
+    return metadata.get('source_size') == stat.st_size and metadata.get('source_mtime_ns') == stat.st_mtime_ns
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Convert and inspect memory-mappable model weight files')
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert = commands.add_parser('convert', help='Convert an HDF5 model to flat weights')
+    convert.add_argument('h5_path')
+    convert.add_argument('-o', '--output', help=f'Output path (default: input with {FLAT_WEIGHTS_SUFFIX})')
+    inspect = commands.add_parser('inspect', help='List the tensors in a flat weight file')
+    inspect.add_argument('path')
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == 'convert':
+            out_path = convert_h5(args.h5_path, args.output)
+            weights = load_flat_weights(out_path)
+            print(f"✅ Wrote {out_path}: {len(weights)} tensors, {weights.nbytes / (1024 * 1024):.1f}MB")
+            return 0
+
+        weights = load_flat_weights(args.path)
+        print(f"📦 {args.path}: {len(weights)} tensors, {weights.nbytes / (1024 * 1024):.1f}MB")
+        for name in weights:
+            array = weights[name]
+            print(f"   {name:<60} {str(array.dtype):>8} {tuple(array.shape)}")
+        return 0
+    except (OSError, FlatWeightsError) as e:
+        print(f"❌ {e}")
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
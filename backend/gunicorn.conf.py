@@ -0,0 +1,41 @@
+"""
+Gunicorn Configuration
+One gthread worker for the Hare Run V6 gateway: threads serve requests while
+skin analyses run in a pool of analysis processes, so they use every core
+"""
+
+import os
+
+from admission import ANALYSIS_CONCURRENCY, ANALYSIS_QUEUE_DEPTH
+
+# Analysis jobs, image sessions and coalesced results live in one process's memory,
+# so a follow-up request on another worker would not find them. CPU parallelism
+# comes from the analysis process pool instead of more workers.
+os.environ.setdefault('ANALYSIS_EXECUTOR', 'process')
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 1))
+worker_class = 'gthread'
+# Every admitted or queued analysis holds a thread, so health checks, model status
+# and job polling need threads beyond those for the admission queue to stay answerable
+GUNICORN_THREAD_HEADROOM = int(os.getenv('GUNICORN_THREAD_HEADROOM', 8))
+threads = int(os.getenv('GUNICORN_THREADS', ANALYSIS_CONCURRENCY + ANALYSIS_QUEUE_DEPTH + GUNICORN_THREAD_HEADROOM))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+
+def on_starting(server):
+    if server.cfg.workers > 1:
+        raise RuntimeError(
+            f"workers={server.cfg.workers}: analysis jobs, image sessions and idempotency results are "
+            "kept in process memory and are not shared between workers; run one worker and raise "
+            "GUNICORN_THREADS or ANALYSIS_PROCESSES instead"
+        )
+    admission_threads = ANALYSIS_CONCURRENCY + ANALYSIS_QUEUE_DEPTH
+    if server.cfg.threads <= admission_threads:
+        server.log.warning(
+            f"threads={server.cfg.threads} leaves none for health checks once {ANALYSIS_CONCURRENCY} running "
+            f"and {ANALYSIS_QUEUE_DEPTH} queued analyses hold theirs; lower ANALYSIS_QUEUE_DEPTH or raise "
+            "GUNICORN_THREADS"
+        )
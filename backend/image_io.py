@@ -0,0 +1,459 @@
+#!/usr/bin/env python3
+"""
+Request Image Decoding
+Reads uploaded images from JSON (base64 data URL), multipart/form-data or raw
+image bodies, enforces size limits from the encoded header and decodes them
+into OpenCV arrays at the resolution analysis needs
+"""
+
+import os
+import struct
+import hashlib
+import binascii
+import logging
+import functools
+import threading
+from dataclasses import dataclass, field
+from typing import Optional, Tuple
+
+import numpy as np
+import cv2
+from werkzeug.exceptions import RequestEntityTooLarge
+
+logger = logging.getLogger(__name__)
+
+# Form field / JSON keys that may carry the image
+IMAGE_FIELDS = ('image', 'image_data')
+
+# Raw body content types accepted in addition to image/*
+RAW_IMAGE_CONTENT_TYPES = ('application/octet-stream',)
+
+STREAM_CHUNK_SIZE = 256 * 1024
+
+# Base64 text is decoded in slices of this many characters (a multiple of 4)
+B64_CHUNK_CHARS = 1024 * 1024
+
+# Per-thread decode buffers larger than this are not kept for reuse
+MAX_REUSED_DECODE_BUFFER = 32 * 1024 * 1024
+
+# A data URL header ("data:image/jpeg;base64,") is never longer than this
+MAX_DATA_URL_HEADER = 256
+
+# Upload limits, checked before any pixel data is decoded
+MAX_IMAGE_BYTES = int(os.getenv('MAX_IMAGE_BYTES', 20 * 1024 * 1024))
+MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', 100_000_000))
+
+# Whole request body limit (Flask MAX_CONTENT_LENGTH); base64 JSON is 4/3 of the image size
+MAX_REQUEST_BYTES = int(os.getenv('MAX_REQUEST_BYTES', MAX_IMAGE_BYTES * 4 // 3 + 64 * 1024))
+
+# Longest image side analysis needs; larger images are decoded at 1/2, 1/4 or 1/8 scale
+ANALYSIS_MAX_DIMENSION = int(os.getenv('ANALYSIS_MAX_DIMENSION', 1920))
+
+REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2)
+)
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+# JPEG start-of-frame markers carrying the image dimensions
+JPEG_SOF_MARKERS = frozenset([0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF])
+
+EXIF_ORIENTATION_TAG = 0x0112
+
+_decode_buffers = threading.local()
+
+
+@dataclass
+class ImageHeader:
+    """Format, stored dimensions and EXIF orientation read from an encoded image"""
+    format: str
+    width: int
+    height: int
+    orientation: int = 1
+
+    @property
+    def oriented_size(self) -> Tuple[int, int]:
+        """(width, height) after applying the EXIF orientation"""
+        if self.orientation in (5, 6, 7, 8):
+            return self.height, self.width
+        return self.width, self.height
+
+
+@dataclass
+class DecodedImage:
+    """A decoded upload and the size of the source image it came from"""
+    array: np.ndarray
+    source_width: int
+    source_height: int
+    format: str = 'unknown'
+    _digest: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+
+    @property
+    def scale(self) -> float:
+        """Decoded width relative to the source width"""
+        return self.array.shape[1] / float(self.source_width) if self.source_width else 1.0
+
+    def to_source_box(self, box: Tuple[int, int, int, int]) -> Tuple[int, int, int, int]:
+        """Map an (x, y, w, h) box on the decoded array to source image coordinates"""
+        factor = 1.0 / self.scale
+        return tuple(int(round(value * factor)) for value in box)
+
+    def content_digest(self) -> str:
+        """Hash of the decoded pixels, computed once and cached"""
+        if self._digest is None:
+            digest = hashlib.blake2b(digest_size=16)
+            digest.update(str(self.array.shape).encode('ascii'))
+            digest.update(np.ascontiguousarray(self.array).data)
+            self._digest = digest.hexdigest()
+        return self._digest
+
+
+class ImageRequestError(Exception):
+    """Raised when a request does not carry a usable image"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def read_stream(stream, content_length: Optional[int] = None) -> memoryview:
+    """Read a binary stream into a single preallocated buffer
+
+    When the length is known the bytes land directly in their final buffer via
+    readinto, without intermediate chunk objects.
+    """
+    getbuffer = getattr(stream, 'getbuffer', None)
+    if getbuffer is not None:
+        # In-memory multipart parts can be viewed without copying
+        return getbuffer()
+
+    if not content_length and _is_seekable(stream):
+        position = stream.tell()
+        content_length = stream.seek(0, 2) - position
+        stream.seek(position)
+
+    if content_length:
+        buffer = bytearray(content_length)
+        view = memoryview(buffer)
+        filled = 0
+        readinto = getattr(stream, 'readinto', None)
+        while filled < content_length:
+            if readinto is not None:
+                count = readinto(view[filled:])
+            else:
+                chunk = stream.read(min(STREAM_CHUNK_SIZE, content_length - filled))
+                count = len(chunk)
+                view[filled:filled + count] = chunk
+            if not count:
+                break
+            filled += count
+        return view[:filled]
+
+    buffer = bytearray()
+    while True:
+        chunk = stream.read(STREAM_CHUNK_SIZE)
+        if not chunk:
+            break
+        buffer += chunk
+    return memoryview(buffer)
+
+
+def _is_seekable(stream) -> bool:
+    try:
+        return bool(stream.seekable())
+    except Exception:
+        return False
+
+
+def probe_image_header(buffer) -> Optional[ImageHeader]:
+    """Read format, dimensions and orientation from a JPEG or PNG header
+
+    Only the marker segments before the pixel data are touched, so this is cheap
+    enough to run before deciding whether and how to decode.
+    """
+    view = memoryview(buffer)
+    if len(view) >= 24 and bytes(view[:8]) == PNG_SIGNATURE and bytes(view[12:16]) == b'IHDR':
+        width, height = struct.unpack_from('>II', view, 16)
+        return ImageHeader('png', width, height)
+
+    if len(view) >= 4 and view[0] == 0xFF and view[1] == 0xD8:
+        return _probe_jpeg(view)
+
+    return None
+
+
+def _probe_jpeg(view: memoryview) -> Optional[ImageHeader]:
+    """Walk JPEG marker segments up to the start-of-frame"""
+    orientation = 1
+    position = 2
+    size = len(view)
+
+    while position + 4 <= size:
+        if view[position] != 0xFF:
+            return None
+        marker = view[position + 1]
+
+        if marker == 0xFF:
+            position += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            position += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            return None
+
+        segment_length = struct.unpack_from('>H', view, position + 2)[0]
+        segment_end = position + 2 + segment_length
+
+        if marker == 0xE1 and bytes(view[position + 4:position + 10]) == b'Exif\x00\x00':
+            orientation = _exif_orientation(view[position + 10:min(segment_end, size)])
+        elif marker in JPEG_SOF_MARKERS:
+            if position + 9 > size:
+                return None
+            height, width = struct.unpack_from('>HH', view, position + 5)
+            return ImageHeader('jpeg', width, height, orientation)
+
+        position = segment_end
+
+    return None
+
+
+def _exif_orientation(tiff: memoryview) -> int:
+    """Orientation tag from the first IFD of an EXIF TIFF block"""
+    try:
+        byte_order = bytes(tiff[:2])
+        if byte_order == b'II':
+            endian = '<'
+        elif byte_order == b'MM':
+            endian = '>'
+        else:
+            return 1
+
+        ifd_offset = struct.unpack_from(endian + 'I', tiff, 4)[0]
+        entry_count = struct.unpack_from(endian + 'H', tiff, ifd_offset)[0]
+        for index in range(entry_count):
+            entry = ifd_offset + 2 + index * 12
+            tag = struct.unpack_from(endian + 'H', tiff, entry)[0]
+            if tag == EXIF_ORIENTATION_TAG:
+                orientation = struct.unpack_from(endian + 'H', tiff, entry + 8)[0]
+                return orientation if 1 <= orientation <= 8 else 1
+    except struct.error:
+        pass
+    return 1
+
+
+def apply_exif_orientation(image: np.ndarray, orientation: int) -> np.ndarray:
+    """Rotate/flip a decoded image so it is displayed upright"""
+    if orientation == 2:
+        return cv2.flip(image, 1)
+    if orientation == 3:
+        return cv2.rotate(image, cv2.ROTATE_180)
+    if orientation == 4:
+        return cv2.flip(image, 0)
+    if orientation == 5:
+        return cv2.transpose(image)
+    if orientation == 6:
+        return cv2.rotate(image, cv2.ROTATE_90_CLOCKWISE)
+    if orientation == 7:
+        return cv2.flip(cv2.transpose(image), -1)
+    if orientation == 8:
+        return cv2.rotate(image, cv2.ROTATE_90_COUNTERCLOCKWISE)
+    return image
+
+
+def reduced_decode_flag(longest_side: int, target: int = ANALYSIS_MAX_DIMENSION) -> int:
+    """Largest IMREAD_REDUCED_COLOR_* step that still keeps the image at or above target"""
+    if target > 0:
+        for factor, flag in REDUCED_DECODE_FLAGS:
+            if longest_side // factor >= target:
+                return flag
+    return cv2.IMREAD_COLOR
+
+
+def check_image_bytes(size: int):
+    """Reject encoded payloads over the byte limit"""
+    if size > MAX_IMAGE_BYTES:
+        raise ImageRequestError(
+            f'Image is too large ({size} bytes); the limit is {MAX_IMAGE_BYTES} bytes', 413
+        )
+
+
+def check_image_pixels(width: int, height: int):
+    """Reject decoded dimensions over the pixel budget"""
+    if width * height > MAX_IMAGE_PIXELS:
+        raise ImageRequestError(
+            f'Image is too large ({width}x{height}); '
+            f'the limit is {MAX_IMAGE_PIXELS // 1_000_000} megapixels', 413
+        )
+
+
+def decode_image_buffer(buffer) -> DecodedImage:
+    """Decode encoded image bytes (any buffer object) into a BGR array
+
+    The JPEG/PNG header is parsed first to enforce the pixel budget before
+    decoding; other formats are checked against it once decoded. Images
+    larger than ANALYSIS_MAX_DIMENSION are decoded directly at reduced scale,
+    and EXIF orientation is applied explicitly.
+    """
+    nparr = np.frombuffer(buffer, np.uint8)
+    if nparr.size == 0:
+        raise ImageRequestError('Image data is required')
+    check_image_bytes(nparr.size)
+
+    header = probe_image_header(nparr)
+    if header is None:
+        img_array = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        if img_array is None:
+            raise ImageRequestError('Invalid image data')
+        height, width = img_array.shape[:2]
+        check_image_pixels(width, height)
+        return DecodedImage(img_array, width, height)
+
+    check_image_pixels(header.width, header.height)
+
+    flag = reduced_decode_flag(max(header.width, header.height))
+    img_array = cv2.imdecode(nparr, flag | cv2.IMREAD_IGNORE_ORIENTATION)
+    if img_array is None:
+        raise ImageRequestError('Invalid image data')
+
+    source_width, source_height = header.oriented_size
+    return DecodedImage(
+        apply_exif_orientation(img_array, header.orientation),
+        source_width, source_height, header.format
+    )
+
+
+def _get_decode_buffer(size: int) -> bytearray:
+    """This thread's reusable decode buffer, grown to at least ``size`` bytes"""
+    buffer = getattr(_decode_buffers, 'buffer', None)
+    if buffer is not None and len(buffer) >= size:
+        return buffer
+
+    buffer = bytearray(size)
+    if size <= MAX_REUSED_DECODE_BUFFER:
+        _decode_buffers.buffer = buffer
+    return buffer
+
+
+def b64decode_into(data: str, start: int = 0) -> memoryview:
+    """Decode base64 text starting at ``start`` into this thread's reusable buffer
+
+    The text is never split or copied as a whole: fixed-size slices are decoded
+    straight into a preallocated bytearray. Missing ``=`` padding is restored
+    and the payload length is validated. The returned view is only valid until
+    the next call on the same thread.
+    """
+    end = len(data)
+    while end > start and data[end - 1] in ' \t\r\n':
+        end -= 1
+
+    if any(data.find(char, start, end) != -1 for char in ('\n', '\r', ' ', '\t', '-', '_')):
+        # Line-wrapped or URL-safe base64 is rare; normalise it with a single copy
+        data = ''.join(data[start:end].split()).replace('-', '+').replace('_', '/')
+        start, end = 0, len(data)
+
+    while end > start and data[end - 1] == '=':
+        end -= 1
+
+    length = end - start
+    remainder = length % 4
+    if remainder == 1:
+        raise ImageRequestError('Invalid base64 image data: truncated payload')
+
+    decoded_size = (length // 4) * 3 + (remainder - 1 if remainder else 0)
+    check_image_bytes(decoded_size)
+    buffer = _get_decode_buffer(decoded_size)
+    view = memoryview(buffer)
+
+    try:
+        position = 0
+        full_end = end - remainder
+        for offset in range(start, full_end, B64_CHUNK_CHARS):
+            chunk = binascii.a2b_base64(data[offset:min(offset + B64_CHUNK_CHARS, full_end)])
+            view[position:position + len(chunk)] = chunk
+            position += len(chunk)
+
+        if remainder:
+            chunk = binascii.a2b_base64(data[full_end:end] + '=' * (4 - remainder))
+            view[position:position + len(chunk)] = chunk
+            position += len(chunk)
+    except (binascii.Error, ValueError) as e:
+        raise ImageRequestError(f'Invalid base64 image data: {e}')
+
+    return view[:position]
+
+
+def decode_data_url(image_data: str) -> DecodedImage:
+    """Decode a base64 image, with or without a data URL prefix
+
+    The comma is located without splitting the string, and the decoded bytes are
+    passed to cv2.imdecode as a view of the reusable per-thread buffer.
+    """
+    comma = image_data.find(',', 0, MAX_DATA_URL_HEADER)
+    return decode_image_buffer(b64decode_into(image_data, comma + 1))
+
+
+def oversized_body_as_request_error(fn):
+    """Report a request body over the size limit as an ImageRequestError (413)
+
+    Flask raises RequestEntityTooLarge when the body is first read, which may
+    be inside a view's generic exception handling.
+    """
+    @functools.wraps(fn)
+    def wrapper(req, *args, **kwargs):
+        try:
+            return fn(req, *args, **kwargs)
+        except RequestEntityTooLarge:
+            raise ImageRequestError(f'Request body too large; the limit is {req.max_content_length} bytes', 413)
+    return wrapper
+
+
+@oversized_body_as_request_error
+def get_request_field(req, name: str, default=None):
+    """A non-image request parameter from the JSON body, form fields or query string"""
+    if req.is_json:
+        data = req.get_json(silent=True)
+        if isinstance(data, dict) and name in data:
+            return data[name]
+    elif req.mimetype == 'multipart/form-data' and name in req.form:
+        return req.form[name]
+    return req.args.get(name, default)
+
+
+@oversized_body_as_request_error
+def read_request_image(req) -> DecodedImage:
+    """Decode the image carried by a Flask request
+
+    Accepts:
+      - application/json with a base64 (data URL) ``image`` or ``image_data`` field
+      - multipart/form-data with an ``image`` or ``image_data`` file part
+      - a raw ``image/*`` or ``application/octet-stream`` body
+
+    Binary uploads skip base64 entirely and are decoded from the request stream.
+    """
+    mimetype = req.mimetype or ''
+
+    if req.is_json:
+        data = req.get_json(silent=True)
+        if not isinstance(data, dict):
+            raise ImageRequestError('Invalid JSON body')
+        image_data = data.get('image') or data.get('image_data')
+        if not image_data:
+            raise ImageRequestError('Image data is required')
+        return decode_data_url(image_data)
+
+    if mimetype == 'multipart/form-data':
+        upload = next((req.files[field] for field in IMAGE_FIELDS if field in req.files), None)
+        if upload is None:
+            raise ImageRequestError('Image data is required')
+        return decode_image_buffer(read_stream(upload.stream, upload.content_length))
+
+    if mimetype.startswith('image/') or mimetype in RAW_IMAGE_CONTENT_TYPES:
+        check_image_bytes(req.content_length or 0)
+        return decode_image_buffer(read_stream(req.stream, req.content_length))
+
+    raise ImageRequestError(
+        'Content-Type must be application/json, multipart/form-data or image/*'
+    )
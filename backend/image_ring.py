@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Shared Image Ring
+Fixed set of image slots in one shared memory segment, written once by the
+web worker and read in place by analysis processes
+"""
+
+import os
+import queue
+import logging
+from multiprocessing import shared_memory
+from typing import Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Slots are sized for a decoded analysis image; larger images fall back to a one-off segment
+IMAGE_RING_SLOTS = int(os.getenv('IMAGE_RING_SLOTS', 0))
+IMAGE_RING_SLOT_BYTES = int(float(os.getenv('IMAGE_RING_SLOT_MB', 12)) * 1024 * 1024)
+
+
+class SharedImageRing:
+    """``slots`` fixed-size image buffers in a single shared memory segment
+
+    The creating process owns the free list: it acquires a slot, writes an image
+    into it and hands only the slot index, shape and dtype to a worker, which
+    attaches the segment once and views the slot without copying. The slot is
+    released back to the free list when the worker's result returns.
+    """
+
+    def __init__(self, slots: int, slot_bytes: int = IMAGE_RING_SLOT_BYTES, name: Optional[str] = None):
+        self.slots = slots
+        self.slot_bytes = slot_bytes
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * slot_bytes)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self._free: "queue.Queue[int]" = queue.Queue()
+        if self.owner:
+            for slot in range(slots):
+                self._free.put(slot)
+
+    @classmethod
+    def attach(cls, name: str, slots: int, slot_bytes: int) -> 'SharedImageRing':
+        """Open a ring created by another process"""
+        return cls(slots, slot_bytes, name=name)
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def acquire(self, nbytes: int, timeout: float = 0) -> Optional[int]:
+        """A free slot able to hold nbytes, or None if the image is too large or none frees in time"""
+        if nbytes > self.slot_bytes:
+            return None
+        try:
+            return self._free.get(timeout=timeout) if timeout > 0 else self._free.get_nowait()
+        except queue.Empty:
+            return None
+
+    def release(self, slot: int):
+        """Return a slot to the free list once no worker reads it any more"""
+        self._free.put(slot)
+
+    def view(self, slot: int, shape: tuple, dtype) -> np.ndarray:
+        """Array over a slot's memory; drop it before closing the ring"""
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=self.shm.buf, offset=slot * self.slot_bytes)
+
+    def write(self, slot: int, image: np.ndarray):
+        """Copy an image into a slot"""
+        self.view(slot, image.shape, image.dtype)[...] = image
+
+    def stats(self) -> Dict:
+        return {
+            'slots': self.slots,
+            'free_slots': self._free.qsize(),
+            'slot_bytes': self.slot_bytes
+        }
+
+    def close(self):
+        """Detach from the segment, and remove it if this process created it"""
+        self.shm.close()
+        if self.owner:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Image Sessions
+Short-lived, memory-bounded store of decoded uploads so a face detection call
+and the analysis call that follows it share one upload, decode and cascade scan
+"""
+
+import os
+import time
+import secrets
+import logging
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from face_detection import FaceBox
+from image_io import DecodedImage
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SESSION_TTL = float(os.getenv('IMAGE_SESSION_TTL', 120))
+IMAGE_SESSION_MAX_BYTES = int(os.getenv('IMAGE_SESSION_MAX_MB', 256)) * 1024 * 1024
+
+
+@dataclass
+class ImageSession:
+    """A decoded upload and the faces already found in it"""
+    token: str
+    image: DecodedImage
+    faces: List[FaceBox]
+    expires_at: float
+    nbytes: int = field(init=False)
+
+    def __post_init__(self):
+        self.nbytes = int(self.image.array.nbytes)
+
+
+class ImageSessionStore:
+    """LRU store of image sessions bounded by total bytes and a TTL
+
+    Sessions live in the memory of one worker process. A token that has expired,
+    been evicted or was issued by another worker is simply not found, and the
+    client falls back to uploading the image again. While sessions are stored a
+    background sweeper drops expired ones, so an idle worker releases them.
+    """
+
+    def __init__(self, ttl: float = IMAGE_SESSION_TTL, max_bytes: int = IMAGE_SESSION_MAX_BYTES):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, ImageSession]" = OrderedDict()
+        self._total_bytes = 0
+        self._sweeper: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def put(self, image: DecodedImage, faces: List[FaceBox]) -> Optional[str]:
+        """Store a decoded image and return its token, or None if it can never fit"""
+        token = secrets.token_urlsafe(18)
+        session = ImageSession(token, image, list(faces), time.monotonic() + self.ttl)
+        if session.nbytes > self.max_bytes:
+            return None
+
+        with self._lock:
+            self._sessions[token] = session
+            self._total_bytes += session.nbytes
+            self._evict_locked()
+            self._ensure_sweeper_locked()
+        return token
+
+    def get(self, token: str) -> Optional[ImageSession]:
+        """Look up a live session"""
+        with self._lock:
+            self._expire_locked()
+            session = self._sessions.get(token)
+            if session is None:
+                return None
+            self._sessions.move_to_end(token)
+            return session
+
+    def stats(self) -> Dict:
+        """Current store occupancy"""
+        with self._lock:
+            return {
+                'sessions': len(self._sessions),
+                'bytes': self._total_bytes,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl
+            }
+
+    def _remove_locked(self, token: str):
+        session = self._sessions.pop(token, None)
+        if session is not None:
+            self._total_bytes -= session.nbytes
+
+    def _expire_locked(self):
+        now = time.monotonic()
+        for token in [t for t, s in self._sessions.items() if s.expires_at <= now]:
+            self._remove_locked(token)
+
+    def _evict_locked(self):
+        """Drop expired sessions, then least recently used ones until under budget"""
+        self._expire_locked()
+        while self._total_bytes > self.max_bytes and self._sessions:
+            token = next(iter(self._sessions))
+            self._remove_locked(token)
+            logger.info("Evicted image session to stay within memory budget")
+
+    def _ensure_sweeper_locked(self):
+        # Checked on every put, so a worker forked without the thread starts its own
+        if self._sweeper is None or not self._sweeper.is_alive():
+            self._sweeper = threading.Thread(target=self._sweep, name='image-session-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def _sweep(self):
+        """Drop expired sessions every TTL until the store is empty"""
+        while True:
+            time.sleep(self.ttl)
+            with self._lock:
+                self._expire_locked()
+                if not self._sessions:
+                    self._sweeper = None
+                    return
+
+
+# Process-wide session store shared by the detection and analysis endpoints
+image_sessions = ImageSessionStore()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Import Time Report
+Imports a module in a fresh interpreter under ``python -X importtime`` and lists
+the slowest imports, so cold-start regressions show up before they reach the
+container health check.
+
+Usage:
+    python import_report.py                       # the Hare Run V6 app
+    python import_report.py wsgi --top 30
+    python import_report.py --budget 5            # exit 1 if the import takes longer
+"""
+
+import os
+import sys
+import json
+import argparse
+import subprocess
+from typing import Dict, List, Optional
+
+DEFAULT_MODULE = 'application_hare_run_v6_clean'
+IMPORT_TIME_BUDGET = float(os.getenv('IMPORT_TIME_BUDGET', 10))
+
+
+def measure_imports(module: str) -> List[Dict]:
+    """Self and cumulative import time of every module loaded by ``import module``"""
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=os.path.dirname(os.path.abspath(__file__)), capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|', 2)
+        imports.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip()) - 1) // 2,
+            'self_ms': int(self_us) / 1000,
+            'cumulative_ms': int(cumulative_us) / 1000
+        })
+    return imports
+
+
+def module_import_ms(module: str, imports: List[Dict]) -> float:
+    """Cumulative time of ``import module``, from the module's own line
+
+    Interpreter startup imports also appear at the top level, and imports made
+    by threads the module starts shift the nesting, so neither the top-level
+    lines nor the depth identify the module; its name does.
+    """
+    for entry in imports:
+        if entry['module'] == module:
+            return entry['cumulative_ms']
+    return 0.0
+
+
+def print_report(module: str, imports: List[Dict], top: int):
+    total_ms = module_import_ms(module, imports)
+    print(f"⏱️  import {module}: {total_ms / 1000:.2f}s across {len(imports)} modules")
+
+    print("\n📊 Slowest imports (cumulative)")
+    print(f"   {'cumul ms':>9} {'self ms':>8}  module")
+    for entry in sorted(imports, key=lambda e: e['cumulative_ms'], reverse=True)[:top]:
+        print(f"   {entry['cumulative_ms']:>9.1f} {entry['self_ms']:>8.1f}  {'  ' * entry['depth']}{entry['module']}")
+
+    print("\n📊 Slowest module bodies (self)")
+    for entry in sorted(imports, key=lambda e: e['self_ms'], reverse=True)[:top]:
+        print(f"   {entry['self_ms']:>9.1f} ms  {entry['module']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Report the slowest imports of a module')
+    parser.add_argument('module', nargs='?', default=DEFAULT_MODULE, help='Module to import')
+    parser.add_argument('--top', type=int, default=20, help='Number of imports to list')
+    parser.add_argument('--budget', type=float, default=IMPORT_TIME_BUDGET,
+                        help='Seconds the import may take before the report fails')
+    parser.add_argument('--json', help='Write every measured import to this JSON file')
+    args = parser.parse_args(argv)
+
+    try:
+        imports = measure_imports(args.module)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return 1
+
+    print_report(args.module, imports, args.top)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(imports, f, indent=2)
+        print(f"\n📝 Report written to {args.json}")
+
+    total_s = module_import_ms(args.module, imports) / 1000
+    if total_s > args.budget:
+        print(f"\n❌ Import took {total_s:.2f}s, over the {args.budget:.2f}s budget")
+        return 1
+    print(f"\n✅ Within the {args.budget:.2f}s import budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Model Cache
+Local cache of model artifacts from S3, validated by a sidecar manifest
+(ETag, size, content digest) and revalidated with a cheap HEAD request at startup.
+Downloads are published atomically and serialized across processes on a host
+with a file lock, so containers sharing a volume share one download.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Dict, Optional, Union
+
+from model_download import RangedDownloader, file_digest
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines; downloads are not shared between processes there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Hash the whole file against its manifest's digest on startup, not just its size
+MODEL_CACHE_VERIFY_SHA256 = os.getenv('MODEL_CACHE_VERIFY_SHA256', 'false').lower() == 'true'
+# How long to wait for another process's download of the same artifact
+MODEL_CACHE_LOCK_TIMEOUT = float(os.getenv('MODEL_CACHE_LOCK_TIMEOUT', 900))
+
+MANIFEST_SUFFIX = '.manifest.json'
+LOCK_SUFFIX = '.lock'
+
+# How a cached artifact was obtained
+FRESH = 'fresh'              # manifest matches the current S3 object
+DOWNLOADED = 'downloaded'    # fetched now because it was missing or stale
+STALE = 'stale'              # S3 unreachable; manifest-validated local copy used
+UNVERIFIED = 'unverified'    # S3 unreachable; local file without a valid manifest used
+
+
+class CacheLockTimeout(Exception):
+    """Raised when another process holds an artifact's download lock for too long"""
+
+
+@dataclass
+class CachedArtifact:
+    """A model artifact available on local disk"""
+    key: str
+    path: str
+    status: str
+    manifest: Optional[Dict] = None
+    download: Optional[Dict] = None
+    # sha256 of a local file used without a manifest, so the copy in use can be identified
+    sha256: Optional[str] = None
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def file_sha256(path: str, block_bytes: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_bytes), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ModelCache:
+    """Keeps S3 model artifacts in ``directory``, each with a manifest
+
+    ``ensure_many`` revalidates every artifact in parallel: a HEAD request
+    compares the S3 ETag and size with the manifest, and only missing or
+    stale artifacts are downloaded. A file without a manifest, such as one
+    left by a crashed download, is never trusted while S3 is reachable. When S3
+    is unreachable the local copy is used as-is and reported as stale or
+    unverified.
+    """
+
+    def __init__(self, directory: str, client, bucket: str, verify_sha256: bool = MODEL_CACHE_VERIFY_SHA256,
+                 lock_timeout: float = MODEL_CACHE_LOCK_TIMEOUT):
+        self.directory = directory
+        self.client = client
+        self.bucket = bucket
+        self.verify_sha256 = verify_sha256
+        self.lock_timeout = lock_timeout
+        os.makedirs(directory, exist_ok=True)
+
+    def ensure_many(self, artifacts: Dict[str, str]) -> Dict[str, Union[CachedArtifact, Exception]]:
+        """Make every S3 key -> filename artifact available; failures are returned, not raised"""
+        results: Dict[str, Union[CachedArtifact, Exception]] = {}
+        if not artifacts:
+            return results
+        with RangedDownloader(self.client) as downloader, \
+                ThreadPoolExecutor(max_workers=len(artifacts), thread_name_prefix='model-cache') as pool:
+            futures = {pool.submit(self.ensure, key, filename, downloader): key
+                       for key, filename in artifacts.items()}
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    results[key] = future.result()
+                except Exception as e:
+                    logger.error(f"Model artifact {key} unavailable: {e}")
+                    results[key] = e
+        return results
+
+    def ensure(self, key: str, filename: str, downloader: RangedDownloader) -> CachedArtifact:
+        """Revalidate one artifact and download it if missing or stale"""
+        path = os.path.join(self.directory, filename)
+        with self._locked(path):
+            manifest = self.read_manifest(path)
+            try:
+                if self.client is None:
+                    raise RuntimeError('S3 client not available')
+                head = self.client.head_object(Bucket=self.bucket, Key=key)
+            except Exception as e:
+                if not os.path.exists(path):
+                    raise
+                if manifest:
+                    logger.warning(f"Cannot revalidate {key} ({e}); using {STALE} local copy {path}")
+                    return CachedArtifact(key, path, STALE, manifest)
+                sha256 = file_sha256(path)
+                logger.warning(f"Cannot revalidate {key} ({e}); using {UNVERIFIED} local copy {path} "
+                               f"(sha256 {sha256})")
+                return CachedArtifact(key, path, UNVERIFIED, sha256=sha256)
+
+            if (manifest and manifest['etag'] == head['ETag']
+                    and manifest['size'] == int(head['ContentLength'])):
+                return CachedArtifact(key, path, FRESH, manifest)
+
+            logger.info(f"Model artifact {key} is {'stale' if manifest else 'missing'}; downloading")
+            result = downloader.download(self.bucket, key, path)
+            # The downloader hashed every range as it streamed; the file is not read again
+            manifest = {
+                'key': key,
+                'etag': result.etag,
+                'size': result.size,
+                'digest': result.digest,
+                'part_bytes': result.part_bytes,
+                'downloaded_at': datetime.now().isoformat()
+            }
+            self.write_manifest(path, manifest)
+            return CachedArtifact(key, path, DOWNLOADED, manifest, result.to_dict())
+
+    def read_manifest(self, path: str) -> Optional[Dict]:
+        """The artifact's manifest, or None if it is missing or does not match the file on disk"""
+        try:
+            with open(path + MANIFEST_SUFFIX) as f:
+                manifest = json.load(f)
+            size = os.path.getsize(path)
+        except (OSError, ValueError):
+            return None
+        if manifest.get('size') != size or 'etag' not in manifest:
+            return None
+        if self.verify_sha256 and not self._digest_matches(path, manifest):
+            logger.warning(f"Checksum mismatch for {path}; discarding cached copy")
+            return None
+        return manifest
+
+    def _digest_matches(self, path: str, manifest: Dict) -> bool:
+        if 'digest' in manifest and 'part_bytes' in manifest:
+            return manifest['digest'] == file_digest(path, manifest['part_bytes'])
+        # Manifests written before range digests were recorded carry the file's sha256
+        return manifest.get('sha256') == file_sha256(path)
+
+    def write_manifest(self, path: str, manifest: Dict):
+        tmp_path = f"{path}{MANIFEST_SUFFIX}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path + MANIFEST_SUFFIX)
+
+    @contextmanager
+    def _locked(self, path: str):
+        """Exclusive lock on an artifact across processes on this host"""
+        if fcntl is None:
+            yield
+            return
+        with open(path + LOCK_SUFFIX, 'a') as lock_file:
+            deadline = time.monotonic() + self.lock_timeout
+            while True:
+                try:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if time.monotonic() >= deadline:
+                        raise CacheLockTimeout(f"Timed out waiting for another process to download {path}")
+                    time.sleep(0.5)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Model Download
+Parallel ranged S3 downloads for large model artifacts: byte ranges are fetched
+concurrently over pooled connections, hashed as they stream, and recorded in a
+progress file so an interrupted download resumes where it stopped
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+S3_DOWNLOAD_PART_BYTES = int(float(os.getenv('S3_DOWNLOAD_PART_MB', 16)) * 1024 * 1024)
+S3_DOWNLOAD_CONCURRENCY = int(os.getenv('S3_DOWNLOAD_CONCURRENCY', 8))
+# Enough connections for every range worker plus the artifacts' metadata requests
+S3_MAX_POOL_CONNECTIONS = int(os.getenv('S3_MAX_POOL_CONNECTIONS', S3_DOWNLOAD_CONCURRENCY * 2))
+
+# Size of the blocks written and hashed while a range streams in
+STREAM_BLOCK_BYTES = 1024 * 1024
+
+
+class DownloadError(Exception):
+    """Raised when an artifact could not be downloaded completely"""
+
+
+@dataclass
+class DownloadResult:
+    """A completed artifact download"""
+    key: str
+    path: str
+    size: int
+    etag: str
+    # sha256 of the concatenated per-range sha256 digests, suffixed with the range count
+    digest: str
+    part_bytes: int
+    parts: int
+    resumed_parts: int
+    seconds: float
+
+    def to_dict(self) -> Dict:
+        return asdict(self)
+
+
+def composite_digest(part_digests: List[str]) -> str:
+    combined = hashlib.sha256(b''.join(bytes.fromhex(d) for d in part_digests)).hexdigest()
+    return f"{combined}-{len(part_digests)}"
+
+
+def file_digest(path: str, part_bytes: int) -> str:
+    """composite_digest of a file on disk, hashed in the ranges it was downloaded in"""
+    part_digests = []
+    with open(path, 'rb') as f:
+        while True:
+            digest = hashlib.sha256()
+            remaining = part_bytes
+            while remaining:
+                block = f.read(min(STREAM_BLOCK_BYTES, remaining))
+                if not block:
+                    break
+                digest.update(block)
+                remaining -= len(block)
+            if remaining == part_bytes:
+                return composite_digest(part_digests)
+            part_digests.append(digest.hexdigest())
+
+
+class RangedDownloader:
+    """Downloads S3 objects as concurrent byte-range GETs
+
+    Each range is written in place into ``<path>.part`` and hashed while it
+    streams. Completed ranges and their digests are recorded in
+    ``<path>.part.json``; a later download of the same object version (same
+    ETag and size) re-verifies those ranges on disk and fetches only the rest.
+    Every range is requested with If-Match on the ETag, so an object replaced
+    mid-download fails instead of mixing versions. The finished file is
+    renamed into place.
+    """
+
+    def __init__(self, client, concurrency: int = S3_DOWNLOAD_CONCURRENCY,
+                 part_bytes: int = S3_DOWNLOAD_PART_BYTES):
+        self.client = client
+        self.part_bytes = max(STREAM_BLOCK_BYTES, part_bytes)
+        self._ranges = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='s3-range')
+
+    def __enter__(self) -> 'RangedDownloader':
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self._ranges.shutdown(wait=True, cancel_futures=True)
+
+    def download(self, bucket: str, key: str, path: str) -> DownloadResult:
+        """Download one object to path, resuming a previous partial download"""
+        started = time.monotonic()
+        head = self.client.head_object(Bucket=bucket, Key=key)
+        size, etag = int(head['ContentLength']), head['ETag']
+
+        part_path, progress_path = f"{path}.part", f"{path}.part.json"
+        ranges = [(start, min(start + self.part_bytes, size) - 1) for start in range(0, size, self.part_bytes)]
+        completed = self._resumable_parts(progress_path, part_path, etag, size, ranges)
+        resumed = len(completed)
+        if resumed:
+            logger.info(f"Resuming s3://{bucket}/{key}: {resumed}/{len(ranges)} ranges already downloaded")
+
+        with open(part_path, 'r+b' if os.path.exists(part_path) else 'w+b') as f:
+            f.truncate(size)
+        fd = os.open(part_path, os.O_RDWR)
+        try:
+            futures = {self._ranges.submit(self._fetch_range, bucket, key, etag, fd, start, end): index
+                       for index, (start, end) in enumerate(ranges) if index not in completed}
+            try:
+                for future in as_completed(futures):
+                    completed[futures[future]] = future.result()
+                    self._save_progress(progress_path, etag, size, completed)
+            except BaseException:
+                # Ranges already streaming still write to fd; let them finish before it closes
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+                raise
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        os.replace(part_path, path)
+        try:
+            os.remove(progress_path)
+        except FileNotFoundError:
+            pass
+        result = DownloadResult(
+            key=key, path=path, size=size, etag=etag,
+            digest=composite_digest([completed[i] for i in range(len(ranges))]), part_bytes=self.part_bytes,
+            parts=len(ranges), resumed_parts=resumed, seconds=round(time.monotonic() - started, 3)
+        )
+        logger.info(f"Downloaded s3://{bucket}/{key} ({size / (1024 * 1024):.1f}MB, {len(ranges)} ranges) "
+                    f"in {result.seconds:.2f}s")
+        return result
+
+    def _fetch_range(self, bucket: str, key: str, etag: str, fd: int, start: int, end: int) -> str:
+        """Stream bytes start..end into the part file and return their sha256"""
+        response = self.client.get_object(Bucket=bucket, Key=key, Range=f'bytes={start}-{end}', IfMatch=etag)
+        digest = hashlib.sha256()
+        offset = start
+        for block in response['Body'].iter_chunks(STREAM_BLOCK_BYTES):
+            os.pwrite(fd, block, offset)
+            digest.update(block)
+            offset += len(block)
+        if offset != end + 1:
+            raise DownloadError(f"Range {start}-{end} of {key} ended after {offset - start} bytes")
+        return digest.hexdigest()
+
+    def _resumable_parts(self, progress_path: str, part_path: str, etag: str, size: int,
+                         ranges: List[Tuple[int, int]]) -> Dict[int, str]:
+        """Recorded ranges of the same object version whose bytes on disk still match their digest"""
+        try:
+            with open(progress_path) as f:
+                progress = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if (progress.get('etag') != etag or progress.get('size') != size
+                or progress.get('part_bytes') != self.part_bytes or not os.path.exists(part_path)):
+            return {}
+
+        verified = {}
+        with open(part_path, 'rb') as f:
+            for index, digest in progress.get('parts', {}).items():
+                index = int(index)
+                if index >= len(ranges):
+                    continue
+                start, end = ranges[index]
+                f.seek(start)
+                if hashlib.sha256(f.read(end - start + 1)).hexdigest() == digest:
+                    verified[index] = digest
+        return verified
+
+    def _save_progress(self, progress_path: str, etag: str, size: int, completed: Dict[int, str]):
+        tmp_path = f"{progress_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'etag': etag, 'size': size, 'part_bytes': self.part_bytes,
+                       'parts': {str(i): d for i, d in completed.items()}}, f)
+        os.replace(tmp_path, progress_path)
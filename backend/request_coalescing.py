@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Request Coalescing
+Single-flight execution of identical in-flight analyses and replay of results
+for client-supplied idempotency keys
+"""
+
+import os
+import time
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_TTL = float(os.getenv('IDEMPOTENCY_TTL', 300))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv('IDEMPOTENCY_MAX_ENTRIES', 1024))
+
+
+class IdempotencyConflict(Exception):
+    """Raised when an idempotency key is reused for a different request"""
+
+    status_code = 422
+
+    def __init__(self):
+        super().__init__('Idempotency-Key was already used for a different request')
+
+
+class _Flight:
+    """One in-progress computation and the callers waiting on it
+
+    The future can be waited on from threads and, wrapped, from coroutines.
+    """
+
+    def __init__(self):
+        self.future: Future = Future()
+
+
+class RequestCoalescer:
+    """Shares one computation between concurrent identical requests
+
+    Callers pass a key identifying the work (content hash plus parameters).
+    The first caller for a key computes; callers arriving while it runs wait and
+    receive the same result or exception. When an idempotency key is given the
+    result is also kept for ``idempotency_ttl`` seconds and replayed to later
+    requests carrying that key.
+    """
+
+    def __init__(self, idempotency_ttl: float = IDEMPOTENCY_TTL,
+                 max_entries: int = IDEMPOTENCY_MAX_ENTRIES):
+        self.idempotency_ttl = idempotency_ttl
+        self.max_entries = max_entries
+        self._flights: Dict[str, _Flight] = {}
+        self._completed: "OrderedDict[str, Tuple[str, float, Any]]" = OrderedDict()
+        self._computed = 0
+        self._shared = 0
+        self._replayed = 0
+        self._lock = threading.Lock()
+
+    def run(self, key: str, fn: Callable[[], Any], idempotency_key: Optional[str] = None) -> Tuple[Any, str]:
+        """Result of ``fn()`` for key, and whether it was 'computed', 'shared' or 'replayed'
+
+        Only the caller that computes runs ``fn``, so work it does before
+        computing, such as waiting for an analysis slot, is skipped by the others.
+        """
+        flight, leader, replayed = self._join(key, idempotency_key)
+        if flight is None:
+            return replayed, 'replayed'
+
+        if leader:
+            try:
+                result = fn()
+            except BaseException as e:
+                self._land(key, flight, error=e)
+                raise
+            self._land(key, flight, result=result)
+            outcome = 'computed'
+        else:
+            result = flight.future.result()
+            outcome = 'shared'
+
+        if idempotency_key:
+            self._remember(idempotency_key, key, result)
+        return result, outcome
+
+    async def run_async(self, key: str, fn: Callable[[], Awaitable], idempotency_key: Optional[str] = None
+                        ) -> Tuple[Any, str]:
+        """run() for coroutines: ``fn`` returns an awaitable and waiters do not block the loop
+
+        The computation finishes for its followers even if the caller that
+        started it is cancelled.
+        """
+        flight, leader, replayed = self._join(key, idempotency_key)
+        if flight is None:
+            return replayed, 'replayed'
+
+        if leader:
+            task = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda done: self._land_task(key, flight, done))
+            result = await asyncio.shield(task)
+            outcome = 'computed'
+        else:
+            result = await asyncio.shield(asyncio.wrap_future(flight.future))
+            outcome = 'shared'
+
+        if idempotency_key:
+            self._remember(idempotency_key, key, result)
+        return result, outcome
+
+    def _join(self, key: str, idempotency_key: Optional[str]) -> Tuple[Optional[_Flight], bool, Any]:
+        """The flight for key and whether this caller leads it, or no flight and a replayed result"""
+        with self._lock:
+            if idempotency_key:
+                completed = self._lookup_locked(idempotency_key)
+                if completed is not None:
+                    completed_key, result = completed
+                    if completed_key != key:
+                        raise IdempotencyConflict()
+                    self._replayed += 1
+                    return None, False, result
+
+            flight = self._flights.get(key)
+            if flight is not None:
+                self._shared += 1
+                return flight, False, None
+            flight = _Flight()
+            self._flights[key] = flight
+            return flight, True, None
+
+    def _land(self, key: str, flight: _Flight, result: Any = None, error: Optional[BaseException] = None):
+        with self._lock:
+            del self._flights[key]
+            self._computed += 1
+        if error is not None:
+            flight.future.set_exception(error)
+        else:
+            flight.future.set_result(result)
+
+    def _land_task(self, key: str, flight: _Flight, task: asyncio.Future):
+        if task.cancelled():
+            self._land(key, flight, error=asyncio.CancelledError())
+        elif task.exception() is not None:
+            self._land(key, flight, error=task.exception())
+        else:
+            self._land(key, flight, result=task.result())
+
+    def stats(self) -> Dict:
+        """In-flight computations and coalescing counters"""
+        with self._lock:
+            return {
+                'in_flight': len(self._flights),
+                'idempotent_results': len(self._completed),
+                'computed': self._computed,
+                'shared': self._shared,
+                'replayed': self._replayed
+            }
+
+    def _lookup_locked(self, idempotency_key: str) -> Optional[Tuple[str, Any]]:
+        entry = self._completed.get(idempotency_key)
+        if entry is None:
+            return None
+        key, expires_at, result = entry
+        if expires_at <= time.monotonic():
+            del self._completed[idempotency_key]
+            return None
+        return key, result
+
+    def _remember(self, idempotency_key: str, key: str, result: Any):
+        with self._lock:
+            self._completed[idempotency_key] = (key, time.monotonic() + self.idempotency_ttl, result)
+            self._completed.move_to_end(idempotency_key)
+            while len(self._completed) > self.max_entries:
+                self._completed.popitem(last=False)
+
+
+# Process-wide coalescer shared by the analysis endpoints of both gateways
+analysis_coalescer = RequestCoalescer()
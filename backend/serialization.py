@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Response Serialization
+NumPy-aware JSON encoding for Flask responses, with MessagePack content
+negotiation for internal and batch consumers, ``fields=`` response projection
+and gzip/brotli compression of large payloads
+"""
+
+import os
+import gzip
+import json
+import logging
+from typing import Any, Dict, Iterable, Optional, Union
+
+import numpy as np
+from flask import has_request_context, request
+from flask.json.provider import DefaultJSONProvider
+
+logger = logging.getLogger(__name__)
+
+# orjson encodes NumPy scalars and arrays natively in C; fall back to the stdlib encoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# MessagePack is optional; without it every response is JSON
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Brotli is optional; without it large responses are gzip-compressed
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+# Top-level keys kept by every projection so clients can always tell success from failure
+ALWAYS_INCLUDED_FIELDS = ('success', 'error', 'message')
+
+# Responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+GZIP_LEVEL = int(os.getenv('GZIP_LEVEL', 6))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 5))
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/plain', 'text/html', 'application/x-ndjson') + MSGPACK_MIMETYPES
+
+# Projection tree: nested dicts of selected keys, with True marking a fully selected subtree
+FieldTree = Dict[str, Union[bool, 'FieldTree']]
+
+
+def encode_numpy(obj: Any) -> Any:
+    """Fallback conversion for values the encoder cannot handle natively"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f'Object of type {type(obj).__name__} is not serializable')
+
+
+def dumps_bytes(obj: Any, sort_keys: bool = False) -> bytes:
+    """Encode an object containing NumPy values as UTF-8 JSON"""
+    if orjson is not None:
+        options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=encode_numpy, option=options)
+    return json.dumps(obj, default=encode_numpy, sort_keys=sort_keys, separators=(',', ':')).encode('utf-8')
+
+
+def dumps_msgpack(obj: Any) -> bytes:
+    """Encode an object containing NumPy values as MessagePack"""
+    return msgpack.packb(obj, default=encode_numpy, use_bin_type=True)
+
+
+def wants_msgpack(req=None) -> bool:
+    """Whether the request (by default the current Flask request) prefers MessagePack over JSON"""
+    if msgpack is None or (req is None and not has_request_context()):
+        return False
+    accept = (req if req is not None else request).accept_mimetypes
+    best = accept.best_match(MSGPACK_MIMETYPES + ('application/json',))
+    return best in MSGPACK_MIMETYPES and accept[best] > accept['application/json']
+
+
+class InvalidFields(ValueError):
+    """Raised when a request's ``fields`` projection is not a string or a list of strings"""
+
+    status_code = 400
+
+    def __init__(self):
+        super().__init__('fields must be a comma-separated string or a list of dotted field paths')
+
+
+def parse_fields(spec: Union[str, Iterable[str], None]) -> Optional[FieldTree]:
+    """Parse ``fields`` such as ``"results.health_score,results.conditions.acne"``
+
+    Accepts a comma-separated string or a list of dotted paths. Returns None
+    when no projection was requested; raises InvalidFields for anything else.
+    """
+    if isinstance(spec, str):
+        paths = spec.split(',')
+    elif isinstance(spec, (list, tuple)) and all(isinstance(path, str) for path in spec):
+        paths = spec
+    elif spec is None:
+        return None
+    else:
+        raise InvalidFields()
+
+    tree: FieldTree = {}
+    for path in paths:
+        keys = [key for key in path.strip().split('.') if key]
+        if not keys:
+            continue
+        node = tree
+        for key in keys[:-1]:
+            if node.get(key) is True:
+                break  # an enclosing field is already selected in full
+            node = node.setdefault(key, {})
+        else:
+            node[keys[-1]] = True
+    return tree or None
+
+
+def select_fields(tree: Optional[FieldTree], *path: str) -> Union[bool, FieldTree, None]:
+    """Projection below ``path``: True if fully selected, None if not selected at all"""
+    if tree is None:
+        return True
+    node: Union[bool, FieldTree, None] = tree
+    for key in path:
+        if node is True:
+            return True
+        node = node.get(key)
+        if node is None:
+            return None
+    return node
+
+
+def project_fields(obj: Any, tree: Union[bool, FieldTree]) -> Any:
+    """Keep only the selected keys of obj; a projection on a list applies to each item"""
+    if tree is True:
+        return obj
+    if isinstance(obj, dict):
+        return {key: project_fields(value, tree[key]) for key, value in obj.items() if key in tree}
+    if isinstance(obj, (list, tuple)):
+        return [project_fields(item, tree) for item in obj]
+    return obj
+
+
+def project_response(body: Dict, tree: Optional[FieldTree]) -> Dict:
+    """Apply a ``fields`` projection to a response body, keeping status keys"""
+    if tree is None or not isinstance(body, dict):
+        return body
+    projected = project_fields(body, tree)
+    for key in ALWAYS_INCLUDED_FIELDS:
+        if key in body:
+            projected.setdefault(key, body[key])
+    return projected
+
+
+def requested_fields(req=None) -> Optional[FieldTree]:
+    """The ``fields`` projection of a request, from the query string or the body
+
+    Raises InvalidFields when the projection is malformed.
+    """
+    req = req if req is not None else request
+    spec = req.args.get('fields')
+    if spec is None:
+        if req.is_json:
+            data = req.get_json(silent=True)
+            if isinstance(data, dict):
+                spec = data.get('fields')
+        elif req.mimetype == 'multipart/form-data':
+            spec = req.form.get('fields')
+    return parse_fields(spec)
+
+
+def negotiate_encoding(req=None) -> Optional[str]:
+    """Preferred supported Content-Encoding of the request (by default the current Flask request)"""
+    accept = (req if req is not None else request).accept_encodings
+    supported = ('br', 'gzip') if brotli is not None else ('gzip',)
+    best = accept.best_match(supported)
+    return best if best and accept[best] > 0 else None
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    """Encode a body with the negotiated Content-Encoding ('br' or 'gzip')"""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_LEVEL)
+
+
+def compress_response(response):
+    """Compress a buffered response with gzip or brotli when the client accepts it
+
+    Intended as an ``after_request`` hook. Streamed responses, small bodies and
+    already-encoded or non-compressible content are passed through unchanged.
+    """
+    if (response.direct_passthrough or response.is_streamed
+            or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    encoding = negotiate_encoding()
+    if encoding is None or response.calculate_content_length() < COMPRESSION_MIN_SIZE:
+        return response
+
+    data = response.get_data()
+    compressed = compress_bytes(data, encoding)
+    if len(compressed) >= len(data):
+        return response
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+class NumpyJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that serializes NumPy values without per-field conversion
+
+    ``jsonify`` responses are content-negotiated: clients sending
+    ``Accept: application/msgpack`` receive MessagePack when it is installed.
+    """
+
+    sort_keys = False
+
+    def dumps(self, obj: Any, **kwargs) -> str:
+        return dumps_bytes(obj, sort_keys=kwargs.get('sort_keys', self.sort_keys)).decode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+
+        if wants_msgpack():
+            response = self._app.response_class(dumps_msgpack(obj), mimetype=MSGPACK_MIMETYPES[0])
+        else:
+            response = self._app.response_class(dumps_bytes(obj, sort_keys=self.sort_keys) + b'\n',
+                                                mimetype=self.mimetype)
+        response.vary.add('Accept')
+        return response
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Startup Orchestration
+Runs the slow service initialization steps (S3 client, face cascades, skin
+analyzer, model download) concurrently in background threads, so the server
+answers health checks at once and routes needing an unfinished step fail fast
+"""
+
+import os
+import time
+import logging
+import threading
+import functools
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds a client is told to wait before retrying a request rejected during startup
+STARTUP_RETRY_AFTER = int(os.getenv('STARTUP_RETRY_AFTER', 5))
+
+PENDING = 'pending'
+RUNNING = 'running'
+READY = 'ready'
+FAILED = 'failed'
+
+
+class StartupInProgress(Exception):
+    """Raised when a request needs a component that is still initializing"""
+
+    status_code = 503
+
+    def __init__(self, waiting_for: Iterable[str], status: Dict, retry_after: int = STARTUP_RETRY_AFTER):
+        self.waiting_for = list(waiting_for)
+        super().__init__(f"Service is starting; waiting for {', '.join(self.waiting_for)}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _Component:
+    """One initialization step and its progress"""
+
+    def __init__(self, name: str, init: Callable[[], None], requires: Tuple[str, ...] = ()):
+        self.name = name
+        self.init = init
+        self.requires = requires
+        self.state = PENDING
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.error: Optional[str] = None
+        self.settled = threading.Event()
+
+    def to_dict(self) -> Dict:
+        info = {'state': self.state}
+        if self.started_at is not None:
+            end = self.finished_at if self.finished_at is not None else time.monotonic()
+            info['elapsed_seconds'] = round(end - self.started_at, 3)
+        if self.error:
+            info['error'] = self.error
+        return info
+
+
+class StartupOrchestrator:
+    """Runs registered initialization steps in parallel and tracks their state
+
+    A component is settled once its step has either finished or failed; a
+    failed component is settled too, so callers fall back to their degraded
+    behaviour instead of waiting forever. A step that requires other components
+    starts once they have settled.
+    """
+
+    def __init__(self):
+        self._components: Dict[str, _Component] = {}
+        self._started_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def register(self, name: str, init: Callable[[], None], requires: Tuple[str, ...] = ()):
+        """Add an initialization step; it runs when start() is called"""
+        with self._lock:
+            self._components[name] = _Component(name, init, requires)
+
+    def start(self):
+        """Start every pending step in its own daemon thread"""
+        with self._lock:
+            if self._started_at is None:
+                self._started_at = time.monotonic()
+            pending = [c for c in self._components.values() if c.state == PENDING]
+            for component in pending:
+                component.state = RUNNING
+        for component in pending:
+            threading.Thread(target=self._run, args=(component,), name=f'startup-{component.name}',
+                             daemon=True).start()
+
+    def _run(self, component: _Component):
+        for name in component.requires:
+            self._components[name].settled.wait()
+        component.started_at = time.monotonic()
+        logger.info(f"Initializing {component.name}...")
+        try:
+            component.init()
+            state, error = READY, None
+            logger.info(f"Initialized {component.name} in {time.monotonic() - component.started_at:.2f}s")
+        except Exception as e:
+            state, error = FAILED, str(e)
+            logger.error(f"Failed to initialize {component.name}: {e}")
+        with self._lock:
+            component.state = state
+            component.error = error
+            component.finished_at = time.monotonic()
+        component.settled.set()
+
+    def wait(self, names: Optional[Iterable[str]] = None, timeout: Optional[float] = None) -> bool:
+        """Block until the named (or all) components settle; False if the timeout passed first"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for component in self._select(names):
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not component.settled.wait(remaining):
+                return False
+        return True
+
+    def require(self, *names: str):
+        """Raise StartupInProgress unless every named component has settled"""
+        waiting_for = [c.name for c in self._select(names) if not c.settled.is_set()]
+        if waiting_for:
+            raise StartupInProgress(waiting_for, self.status())
+
+    def requires(self, *names: str) -> Callable:
+        """Decorate a Flask view so it is rejected until the named components settle"""
+        def decorator(view: Callable) -> Callable:
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                self.require(*names)
+                return view(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def status(self) -> Dict:
+        """Overall progress and the state and timing of each component"""
+        with self._lock:
+            components = {name: c.to_dict() for name, c in self._components.items()}
+        settled = sum(1 for info in components.values() if info['state'] in (READY, FAILED))
+        return {
+            'ready': settled == len(components),
+            'progress': round(settled / len(components), 3) if components else 1.0,
+            'elapsed_seconds': round(time.monotonic() - self._started_at, 3) if self._started_at else 0.0,
+            'failed': [name for name, info in components.items() if info['state'] == FAILED],
+            'components': components
+        }
+
+    def _select(self, names: Optional[Iterable[str]]):
+        if names is None:
+            return list(self._components.values())
+        return [self._components[name] for name in names]
+
+
+# Process-wide orchestrator for the Hare Run V6 gateways
+service_startup = StartupOrchestrator()
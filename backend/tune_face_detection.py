@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Face Detection Parameter Tuner
+Sweeps cascade parameters and working resolution over a labeled local image set,
+reports the latency/recall Pareto frontier and writes the chosen settings to the
+config read by face_detection at startup.
+
+Corpus layout:
+    <corpus>/labels.json   {"image.jpg": [[x, y, w, h], ...], "no_face.png": [], "any_face.jpg": true}
+    <corpus>/<images>
+
+A list gives ground-truth face boxes (empty for images without faces); ``true``
+marks an image that contains a face without box annotations.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+from typing import Dict, List, Optional, Tuple, Union
+
+import cv2
+
+from face_detection import (
+    face_detector_pool, DEFAULT_DETECTION_PARAMS, ANALYSIS_DETECTION_PARAMS,
+    FACE_DETECTION_CONFIG, FACE_DETECTION_CONFIG_PATH
+)
+
+DEFAULT_SCALE_FACTORS = [1.05, 1.1, 1.2, 1.3]
+DEFAULT_MIN_NEIGHBORS = [3, 4, 5, 6]
+DEFAULT_WORKING_DIMENSIONS = [320, 480, 640, 800, 1024]
+
+Label = Union[bool, List[List[int]]]
+
+
+def load_corpus(corpus_dir: str) -> List[Tuple[str, object, Label]]:
+    """Load labeled images from a corpus directory"""
+    with open(os.path.join(corpus_dir, 'labels.json'), 'r') as f:
+        labels = json.load(f)
+
+    corpus = []
+    for filename, label in sorted(labels.items()):
+        image = cv2.imread(os.path.join(corpus_dir, filename), cv2.IMREAD_COLOR)
+        if image is None:
+            print(f"⚠️  Skipping unreadable image: {filename}")
+            continue
+        corpus.append((filename, image, label))
+    return corpus
+
+
+def box_iou(a: Tuple[int, int, int, int], b: Tuple[int, int, int, int]) -> float:
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ix = max(0, min(a[0] + a[2], b[0] + b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[1] + a[3], b[1] + b[3]) - max(a[1], b[1]))
+    intersection = ix * iy
+    union = a[2] * a[3] + b[2] * b[3] - intersection
+    return intersection / float(union) if union > 0 else 0.0
+
+
+def match_faces(detected: List[Tuple[int, int, int, int]], label: Label, iou_threshold: float) -> Tuple[int, int, int]:
+    """Return (true positives, expected faces, false positives) for one image"""
+    if label is True:
+        found = 1 if detected else 0
+        return found, 1, max(0, len(detected) - 1)
+
+    expected = [tuple(box) for box in (label or [])]
+    unmatched = list(detected)
+    true_positives = 0
+    for truth in expected:
+        best = max(unmatched, key=lambda box: box_iou(box, truth), default=None)
+        if best is not None and box_iou(best, truth) >= iou_threshold:
+            unmatched.remove(best)
+            true_positives += 1
+    return true_positives, len(expected), len(unmatched)
+
+
+def evaluate(corpus: List[Tuple[str, object, Label]], params: Dict, working_max_dimension: int,
+             iou_threshold: float, repeats: int) -> Dict:
+    """Measure recall, false positives and mean latency for one parameter set"""
+    original_dimension = FACE_DETECTION_CONFIG['working_max_dimension']
+    FACE_DETECTION_CONFIG['working_max_dimension'] = working_max_dimension
+    try:
+        true_positives = expected = false_positives = 0
+        elapsed = 0.0
+        for _, image, label in corpus:
+            for _ in range(repeats):
+                start = time.perf_counter()
+                faces = face_detector_pool.detect_faces(image, **params)
+                elapsed += time.perf_counter() - start
+            tp, total, fp = match_faces(faces, label, iou_threshold)
+            true_positives += tp
+            expected += total
+            false_positives += fp
+    finally:
+        FACE_DETECTION_CONFIG['working_max_dimension'] = original_dimension
+
+    return {
+        'scaleFactor': params['scaleFactor'],
+        'minNeighbors': params['minNeighbors'],
+        'working_max_dimension': working_max_dimension,
+        'recall': true_positives / float(expected) if expected else 1.0,
+        'false_positives': false_positives,
+        'latency_ms': elapsed * 1000.0 / (len(corpus) * repeats)
+    }
+
+
+def pareto_frontier(results: List[Dict]) -> List[Dict]:
+    """Results not beaten on both latency and recall, fastest first"""
+    frontier = []
+    best_recall = -1.0
+    for result in sorted(results, key=lambda r: (r['latency_ms'], -r['recall'])):
+        if result['recall'] > best_recall:
+            frontier.append(result)
+            best_recall = result['recall']
+    return frontier
+
+
+def choose_setting(frontier: List[Dict], max_recall_loss: float) -> Dict:
+    """Fastest frontier point within max_recall_loss of the best recall"""
+    best_recall = max(result['recall'] for result in frontier)
+    for result in frontier:
+        if result['recall'] >= best_recall - max_recall_loss:
+            return result
+    return frontier[-1]
+
+
+def write_config(path: str, chosen: Dict, profile: str):
+    """Merge the chosen setting into the face detection config file"""
+    config = {}
+    if os.path.exists(path):
+        with open(path, 'r') as f:
+            config = json.load(f)
+
+    params = {'scaleFactor': chosen['scaleFactor'], 'minNeighbors': chosen['minNeighbors']}
+    if profile == 'analysis':
+        params['minSize'] = list(ANALYSIS_DETECTION_PARAMS['minSize'])
+        config['analysis_detection_params'] = params
+    else:
+        config['detection_params'] = params
+        config.setdefault('detection', {})['working_max_dimension'] = chosen['working_max_dimension']
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(config, f, indent=2)
+        f.write('\n')
+
+
+def print_results(title: str, results: List[Dict]):
+    """Print a result table"""
+    print(f"\n{title}")
+    print(f"   {'scale':>6} {'neigh':>5} {'width':>6} {'recall':>7} {'fp':>4} {'ms':>8}")
+    for r in results:
+        print(f"   {r['scaleFactor']:>6} {r['minNeighbors']:>5} {r['working_max_dimension']:>6} "
+              f"{r['recall']:>7.3f} {r['false_positives']:>4} {r['latency_ms']:>8.1f}")
+
+
+def parse_list(value: str, cast) -> List:
+    return [cast(item) for item in value.split(',') if item]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Tune face detection parameters against a labeled corpus')
+    parser.add_argument('corpus', help='Directory containing labels.json and the images it lists')
+    parser.add_argument('--profile', choices=['endpoint', 'analysis'], default='endpoint',
+                        help='Tune the API endpoint parameters or the analyzer parameters')
+    parser.add_argument('--scale-factors', default=','.join(map(str, DEFAULT_SCALE_FACTORS)))
+    parser.add_argument('--min-neighbors', default=','.join(map(str, DEFAULT_MIN_NEIGHBORS)))
+    parser.add_argument('--working-dimensions', default=','.join(map(str, DEFAULT_WORKING_DIMENSIONS)),
+                        help='Working resolutions to sweep (endpoint profile only)')
+    parser.add_argument('--iou', type=float, default=0.5, help='IoU needed for a detection to count as a match')
+    parser.add_argument('--max-recall-loss', type=float, default=0.01,
+                        help='Recall that may be given up relative to the best setting')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs per image')
+    parser.add_argument('--report', help='Write all results and the frontier to this JSON file')
+    parser.add_argument('--write', action='store_true', help='Write the chosen setting to the detector config')
+    parser.add_argument('--config', default=FACE_DETECTION_CONFIG_PATH)
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus(args.corpus)
+    if not corpus:
+        print("❌ No labeled images found")
+        return 1
+
+    base_params = ANALYSIS_DETECTION_PARAMS if args.profile == 'analysis' else DEFAULT_DETECTION_PARAMS
+    if args.profile == 'analysis':
+        dimensions = [FACE_DETECTION_CONFIG['working_max_dimension']]
+    else:
+        dimensions = parse_list(args.working_dimensions, int)
+
+    print(f"🔍 Tuning {args.profile} face detection on {len(corpus)} images")
+
+    # Build every thread-local classifier before timing anything
+    for _, image, _ in corpus[:1]:
+        face_detector_pool.detect_faces(image, **base_params)
+
+    results = []
+    for scale_factor, min_neighbors, dimension in itertools.product(
+            parse_list(args.scale_factors, float), parse_list(args.min_neighbors, int), dimensions):
+        params = dict(base_params, scaleFactor=scale_factor, minNeighbors=min_neighbors)
+        results.append(evaluate(corpus, params, dimension, args.iou, args.repeats))
+
+    baseline = evaluate(corpus, dict(base_params), FACE_DETECTION_CONFIG['working_max_dimension'],
+                        args.iou, args.repeats)
+    frontier = pareto_frontier(results)
+    chosen = choose_setting(frontier, args.max_recall_loss)
+
+    print_results("📊 Current setting", [baseline])
+    print_results("📈 Pareto frontier (fastest first)", frontier)
+    print_results("✅ Chosen setting", [chosen])
+    if chosen['latency_ms'] > 0:
+        print(f"   Speedup vs current: {baseline['latency_ms'] / chosen['latency_ms']:.2f}x, "
+              f"recall change: {chosen['recall'] - baseline['recall']:+.3f}")
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump({'baseline': baseline, 'results': results, 'frontier': frontier, 'chosen': chosen}, f, indent=2)
+        print(f"📝 Report written to {args.report}")
+
+    if args.write:
+        write_config(args.config, chosen, args.profile)
+        print(f"💾 Config written to {args.config}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
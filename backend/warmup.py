@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Service Warm-up
+Runs face detection and skin analysis on synthetic images at each working
+resolution before the service reports ready, so OpenCV's lazily built state
+(cascade evaluators, internal thread pools, allocator arenas) and the lazily
+imported analysis dependencies exist before the first real request
+"""
+
+import os
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import cv2
+
+from face_detection import FACE_DETECTION_CONFIG, FaceBox
+from image_io import ANALYSIS_MAX_DIMENSION
+
+logger = logging.getLogger(__name__)
+
+WARMUP_ENABLED = os.getenv('WARMUP_ENABLED', 'true').lower() == 'true'
+# Longest image sides to warm; defaults to the detector's working size and the analysis decode size
+WARMUP_DIMENSIONS = [int(d) for d in os.getenv('WARMUP_DIMENSIONS', '').split(',') if d] or sorted(
+    {FACE_DETECTION_CONFIG['working_max_dimension'], ANALYSIS_MAX_DIMENSION}
+)
+WARMUP_ROUNDS = int(os.getenv('WARMUP_ROUNDS', 2))
+
+# BGR colours inside the detector's YCrCb skin bounds, and a darker background
+SKIN_BGR = (150, 170, 210)
+BACKGROUND_BGR = (70, 80, 90)
+
+
+def synthetic_face_image(longest_side: int, seed: int = 0) -> np.ndarray:
+    """Portrait BGR image with a skin-toned face, eyes, mouth and pixel noise
+
+    Not a face the cascade will find, but it passes the skin pre-check, so
+    detection scans the full pyramid and analysis sees skin-like statistics.
+    """
+    height, width = longest_side, max(1, longest_side * 3 // 4)
+    image = np.full((height, width, 3), BACKGROUND_BGR, dtype=np.uint8)
+    center = (width // 2, height // 2)
+    axes = (width // 3, height // 3)
+    cv2.ellipse(image, center, axes, 0, 0, 360, SKIN_BGR, -1)
+
+    eye_radius = max(1, axes[0] // 6)
+    for eye_x in (center[0] - axes[0] // 2, center[0] + axes[0] // 2):
+        cv2.circle(image, (eye_x, center[1] - axes[1] // 4), eye_radius, (40, 40, 50), -1)
+    cv2.ellipse(image, (center[0], center[1] + axes[1] // 2), (axes[0] // 3, max(1, axes[1] // 10)),
+                0, 0, 360, (90, 90, 170), -1)
+
+    noise = np.random.default_rng(seed).integers(0, 16, image.shape, dtype=np.uint8)
+    return cv2.add(image, noise)
+
+
+def face_region(image: np.ndarray, faces: List[FaceBox]) -> Optional[np.ndarray]:
+    if not faces:
+        return None
+    x, y, w, h = max(faces, key=lambda box: box[2] * box[3])
+    return image[y:y + h, x:x + w]
+
+
+def warm_up(detect_faces: Callable[[np.ndarray], List[FaceBox]], analyzer=None,
+            dimensions: List[int] = WARMUP_DIMENSIONS, rounds: int = WARMUP_ROUNDS,
+            concurrency: int = 1) -> Dict:
+    """Detect and analyze a synthetic image ``rounds`` times at each dimension
+
+    Analyses run ``concurrency`` at a time, so every process of a pool-backed
+    analyzer is warmed. Returns per-round timings in milliseconds; the first
+    round shows the cold cost and the last the steady state.
+    """
+    started = time.perf_counter()
+    resolutions = []
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix='warmup') as pool:
+        for dimension in dimensions:
+            image = synthetic_face_image(dimension)
+            timings = {'dimension': dimension, 'detect_ms': [], 'analyze_ms': []}
+            for _ in range(rounds):
+                t0 = time.perf_counter()
+                faces = detect_faces(image)
+                timings['detect_ms'].append(round((time.perf_counter() - t0) * 1000, 1))
+
+                if analyzer is not None:
+                    roi = face_region(image, faces)
+                    t0 = time.perf_counter()
+                    for future in [pool.submit(analyzer.analyze_skin_conditions, image, roi)
+                                   for _ in range(max(1, concurrency))]:
+                        future.result()
+                    timings['analyze_ms'].append(round((time.perf_counter() - t0) * 1000, 1))
+            resolutions.append(timings)
+            logger.info(f"Warm-up at {dimension}px: detect {timings['detect_ms']} ms, "
+                        f"analyze {timings['analyze_ms']} ms")
+
+    return {
+        'rounds': rounds,
+        'concurrency': concurrency,
+        'resolutions': resolutions,
+        'total_ms': round((time.perf_counter() - started) * 1000, 1)
+    }
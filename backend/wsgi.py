@@ -1,7 +1,10 @@
-# WSGI entry point for Elastic Beanstalk
+# WSGI entry point for Elastic Beanstalk and gunicorn
 # This file is required by the Procfile to run the Flask application
 
-from application_hare_run_v6 import app
+from application_hare_run_v6_clean import app, service_startup
+
+# Initialization runs in the background while the server answers /health
+service_startup.start()
 
 # Elastic Beanstalk expects this variable name
 application = app